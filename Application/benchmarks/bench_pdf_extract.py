@@ -0,0 +1,86 @@
+# benchmarks/bench_pdf_extract.py
+"""Compare in-process and page-parallel PDF text extraction across page counts.
+
+Run from the Application directory:
+
+    python -m benchmarks.bench_pdf_extract --pages 10 50 100 300 --workers 4
+"""
+import argparse
+import time
+
+from src.pdf_extract import PdfTextExtractor
+
+LINE = "Factor investing in fixed income markets requires careful treatment of liquidity and duration risk."
+
+
+def build_pdf(page_count, lines_per_page=45):
+    """Build an uncompressed text-only PDF with the given number of pages"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for page in range(page_count):
+        text = "\n".join(
+            f"({LINE} Page {page + 1}, line {line + 1}.) Tj 0 -16 Td" for line in range(lines_per_page)
+        )
+        stream = f"BT /F1 9 Tf 40 780 Td\n{text}\nET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode("ascii")
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % page_count
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 100, 300])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    serial = PdfTextExtractor(max_workers=1)
+    parallel = PdfTextExtractor(max_workers=args.workers, min_pages_for_pool=0)
+    # Start the workers before timing so the numbers reflect steady-state requests
+    parallel.extract_pages(build_pdf(parallel.max_workers * 2))
+
+    print(f"{'pages':>6} {'serial s':>10} {'parallel s':>11} {'speedup':>8}   ({parallel.max_workers} workers)")
+    try:
+        for page_count in args.pages:
+            pdf_content = build_pdf(page_count)
+            serial_time, serial_pages = best_of(lambda: serial.extract_pages(pdf_content), args.repeat)
+            parallel_time, parallel_pages = best_of(lambda: parallel.extract_pages(pdf_content), args.repeat)
+            assert serial_pages == parallel_pages, "parallel extraction returned different text"
+            print(f"{page_count:>6} {serial_time:>10.3f} {parallel_time:>11.3f} {serial_time / parallel_time:>7.2f}x")
+    finally:
+        parallel.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# benchmarks/bench_startup.py
+"""Measure how long the FastAPI backend takes to import, start serving and warm its services.
+
+External services are replaced by local stand-ins: a fake pinecone package whose
+calls sleep for --latency seconds, or the local vector backend, and dummy
+credentials for S3 and Snowflake, which are not contacted at startup. Exits
+non-zero when the median import or time-to-serve exceeds its limit.
+
+Run from the Application directory:
+
+    python -m benchmarks.bench_startup --runs 5 --latency 2.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+APPLICATION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PINECONE_STANDIN = '''
+import os
+import time
+
+LATENCY = float(os.environ["STANDIN_PINECONE_LATENCY"])
+
+
+class _IndexList(list):
+    def names(self):
+        return list(self)
+
+
+class _Index:
+    def query(self, **kwargs):
+        time.sleep(LATENCY / 10)
+        return {"matches": []}
+
+    def upsert(self, **kwargs):
+        time.sleep(LATENCY / 10)
+
+
+class ServerlessSpec:
+    def __init__(self, **kwargs):
+        pass
+
+
+class Pinecone:
+    def __init__(self, api_key=None):
+        pass
+
+    def list_indexes(self):
+        time.sleep(LATENCY)
+        return _IndexList([os.environ["INDEX_NAME"]])
+
+    def create_index(self, **kwargs):
+        time.sleep(LATENCY)
+
+    def Index(self, name):
+        return _Index()
+'''
+
+CHILD = '''
+import json
+import time
+
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+
+with TestClient(main.app) as client:
+    client.get("/ready")
+    serving = time.perf_counter()
+    deadline = serving + {warm_timeout}
+    while True:
+        services = client.get("/ready").json()["services"]
+        if all(s["ready"] or s["error"] for s in services.values()) or time.perf_counter() > deadline:
+            break
+        time.sleep(0.01)
+    warm = time.perf_counter()
+
+print(json.dumps({{
+    "import": imported - started,
+    "serve": serving - started,
+    "warm": warm - started,
+    "not_ready": sorted(name for name, s in services.items() if not s["ready"]),
+}}))
+'''
+
+
+def run_once(workdir, env, warm_timeout):
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD.format(warm_timeout=warm_timeout)],
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup run failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend", choices=["pinecone", "local"], default="pinecone")
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds each stand-in Pinecone call takes")
+    parser.add_argument("--warm-timeout", type=float, default=30.0)
+    parser.add_argument("--max-import-seconds", type=float, default=3.0)
+    parser.add_argument("--max-serve-seconds", type=float, default=4.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        standins = os.path.join(workdir, "standins")
+        os.makedirs(os.path.join(standins, "pinecone"))
+        with open(os.path.join(standins, "pinecone", "__init__.py"), "w") as f:
+            f.write(PINECONE_STANDIN)
+
+        env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join([standins, APPLICATION_DIR]),
+            "SECRET_KEY": "benchmark",
+            "JWT_ALGORITHM": "HS256",
+            "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+            "AWS_ACCESS_KEY_ID": "benchmark",
+            "AWS_SECRET_ACCESS_KEY": "benchmark",
+            "AWS_REGION": "us-east-1",
+            "AWS_BUCKET_NAME": "benchmark",
+            "PINECONE_API_KEY": "benchmark",
+            "INDEX_NAME": "benchmark",
+            "VECTOR_BACKEND": args.backend,
+            "STANDIN_PINECONE_LATENCY": str(args.latency),
+        }
+
+        runs = [run_once(workdir, env, args.warm_timeout) for _ in range(args.runs)]
+
+    medians = {stage: statistics.median(run[stage] for run in runs) for stage in ("import", "serve", "warm")}
+    print(f"{'stage':>8} {'median s':>9} {'max s':>7}   ({args.runs} runs, {args.backend} backend)")
+    for stage, median in medians.items():
+        print(f"{stage:>8} {median:>9.3f} {max(run[stage] for run in runs):>7.3f}")
+    not_ready = sorted({name for run in runs for name in run["not_ready"]})
+    if not_ready:
+        print(f"not ready after warm-up: {', '.join(not_ready)}")
+
+    failures = []
+    if medians["import"] > args.max_import_seconds:
+        failures.append(f"import took {medians['import']:.3f}s, limit {args.max_import_seconds}s")
+    if medians["serve"] > args.max_serve_seconds:
+        failures.append(f"time to serve was {medians['serve']:.3f}s, limit {args.max_serve_seconds}s")
+    if failures:
+        print("REGRESSION: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,45 @@
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
-import boto3
+from botocore.exceptions import ClientError
 import os
-import snowflake.connector
 from dotenv import load_dotenv
 import re
+import asyncio
+import json
+import hashlib
+from typing import Literal, Optional
+from urllib.parse import urlparse, unquote
 import requests
-from PyPDF2 import PdfReader
 import io
-from pinecone import Pinecone, ServerlessSpec
 import nltk
-from nltk.tokenize import sent_tokenize
 import logging
 import warnings
-import io
+from contextlib import asynccontextmanager
+from src.embeddings import embed_texts, EmbeddingError, EMBEDDING_MODEL
+from src.jobs import JobManager, IngestionError
+from src.nvidia_client import NvidiaClient, NvidiaAPIError
+from src.snowflake_pool import SnowflakePool, PoolTimeout
+from src.catalog_cache import CatalogCache, InvalidCursor, paginate, make_etag, etag_matches
+from src.presign_cache import PresignedUrlCache
+from src.text_cache import ExtractedTextCache
+from src.pdf_extract import PdfTextExtractor
+from src.chunking import iter_chunks, load_token_counter, embedding_chunk_budget, DEFAULT_MAX_TOKENS, DEFAULT_TOKENIZER
+from src.query_cache import QueryEmbeddingCache
+from src.summary_cache import SummaryCache
+from src.document_registry import DocumentRegistry
+from src.ingest_lock import DocumentLock
+from src.vector_backend import PineconeBackend, LocalVectorBackend, VectorBackendError
+from src.services import ServiceContainer
+from src.bm25_index import BM25Store, auto_retrieval_mode, fuse_matches
+from src.summarize import (split_sections, map_reduce_summary, stream_map_reduce_summary, SummarizationError,
+                           MAP_PROMPT_TEMPLATE, REDUCE_PROMPT_TEMPLATE)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -27,12 +48,6 @@ logger = logging.getLogger(__name__)
 nltk_data_path = os.path.join(os.getcwd(), 'nltk_data')
 nltk.data.path.append(nltk_data_path)
 
-# Check if punkt tokenizer is available, if not, download it
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('all', download_dir=nltk_data_path)
-
 warnings.filterwarnings("ignore", category=UserWarning, module="multiprocessing.resource_tracker")
 
 
@@ -54,11 +69,64 @@ NVIDIA_API_KEY_VECTOR=os.getenv("NVIDIA_API_KEY_VECTOR")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT")
 INDEX_NAME = os.getenv("INDEX_NAME")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+NVIDIA_HTTP_MAX_CONNECTIONS = int(os.getenv("NVIDIA_HTTP_MAX_CONNECTIONS", "20"))
+NVIDIA_HTTP_MAX_KEEPALIVE = int(os.getenv("NVIDIA_HTTP_MAX_KEEPALIVE", "10"))
+NVIDIA_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("NVIDIA_HTTP_KEEPALIVE_EXPIRY", "30"))
+NVIDIA_HTTP_TIMEOUT = float(os.getenv("NVIDIA_HTTP_TIMEOUT", "60"))
+NVIDIA_HTTP_RETRIES = int(os.getenv("NVIDIA_HTTP_RETRIES", "3"))
+NVIDIA_HTTP_BACKOFF = float(os.getenv("NVIDIA_HTTP_BACKOFF", "0.5"))
+SNOWFLAKE_POOL_SIZE = int(os.getenv("SNOWFLAKE_POOL_SIZE", "5"))
+SNOWFLAKE_POOL_MAX_IDLE = float(os.getenv("SNOWFLAKE_POOL_MAX_IDLE", "300"))
+SNOWFLAKE_POOL_HEALTH_CHECK_AFTER = float(os.getenv("SNOWFLAKE_POOL_HEALTH_CHECK_AFTER", "30"))
+SNOWFLAKE_POOL_TIMEOUT = float(os.getenv("SNOWFLAKE_POOL_TIMEOUT", "10"))
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "900"))
+PRESIGNED_URL_SAFETY_MARGIN = int(os.getenv("PRESIGNED_URL_SAFETY_MARGIN", "600"))
+PRESIGNED_URL_CACHE_SIZE = int(os.getenv("PRESIGNED_URL_CACHE_SIZE", "5000"))
+TEXT_CACHE_DIR = os.getenv("TEXT_CACHE_DIR", os.path.join(os.getcwd(), 'text_cache'))
+TEXT_CACHE_MAX_MB = int(os.getenv("TEXT_CACHE_MAX_MB", "512"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0"))  # 0 means one per CPU core minus one
+PDF_EXTRACT_MIN_PAGES = int(os.getenv("PDF_EXTRACT_MIN_PAGES", "24"))
+CHUNK_MAX_TOKENS = embedding_chunk_budget(int(os.getenv("CHUNK_MAX_TOKENS", str(DEFAULT_MAX_TOKENS))))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "64"))
+CHUNK_OVERLAP_UNIT = os.getenv("CHUNK_OVERLAP_UNIT", "tokens")  # "tokens" or "chars"
+EMBED_TOKENIZER = os.getenv("EMBED_TOKENIZER", DEFAULT_TOKENIZER)  # empty uses approximate token counts
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH")  # SQLite file to keep query embeddings across restarts
+SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", os.path.join(os.getcwd(), 'summary_cache.sqlite3'))
+SUMMARY_SECTION_TOKENS = int(os.getenv("SUMMARY_SECTION_TOKENS", "3000"))
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "4"))
+SUMMARY_REDUCE_FANOUT = int(os.getenv("SUMMARY_REDUCE_FANOUT", "8"))
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")  # "pinecone" or "local"
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", os.path.join(os.getcwd(), 'vector_store'))
+DOCUMENT_REGISTRY_PATH = os.getenv("DOCUMENT_REGISTRY_PATH", os.path.join(os.getcwd(), 'document_registry.sqlite3'))
+INGEST_LOCK_DIR = os.getenv("INGEST_LOCK_DIR")  # lock files that keep worker processes from ingesting the same PDF
+ASK_INDEX_TIMEOUT = float(os.getenv("ASK_INDEX_TIMEOUT", "60"))  # seconds /ask waits for indexing before answering 202
+WARM_SERVICES_ON_STARTUP = os.getenv("WARM_SERVICES_ON_STARTUP", "true").lower() == "true"
+KEYWORD_INDEX_DIR = os.getenv("KEYWORD_INDEX_DIR", os.path.join(os.getcwd(), 'keyword_index'))
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "auto")  # "vector", "lexical", "hybrid" or "auto"
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "0.5"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+LEXICAL_MAX_TERMS = int(os.getenv("LEXICAL_MAX_TERMS", "4"))
+
+# Slow or networked clients are created on first use, or in the background after startup,
+# so importing this module never waits on Pinecone, S3 or downloads
+services = ServiceContainer()
 
+def ensure_nltk_data():
+    # Check if the punkt sentence tokenizer is available, if not, download it
+    try:
+        nltk.data.find('tokenizers/punkt_tab')
+    except LookupError:
+        if not nltk.download('punkt_tab', download_dir=nltk_data_path, quiet=True):
+            raise LookupError("Could not download the nltk punkt_tab tokenizer")
+    return True
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
 
-def ensure_index_exists():
+def ensure_index_exists(pc):
+    from pinecone import ServerlessSpec
     if INDEX_NAME not in pc.list_indexes().names():
         logger.info(f"Creating new index: {INDEX_NAME}")
         pc.create_index(
@@ -73,26 +141,94 @@ def ensure_index_exists():
     else:
         logger.info(f"Index {INDEX_NAME} already exists")
 
-# Call this function during startup
-ensure_index_exists()
+def create_vector_backend():
+    if VECTOR_BACKEND == "local":
+        logger.info(f"Storing vectors locally in {LOCAL_VECTOR_DIR}")
+        return LocalVectorBackend(LOCAL_VECTOR_DIR)
+    from pinecone import Pinecone
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    ensure_index_exists(pc)
+    # Connect to the index
+    return PineconeBackend(pc.Index(INDEX_NAME), dimension=1024, batch_size=50)
+
+def create_s3_client():
+    import boto3
+    return boto3.client(
+        "s3",
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        region_name=AWS_REGION
+    )
+
+nltk_data = services.register("nltk_data", ensure_nltk_data)
+vector_backend = services.register("vector_backend", create_vector_backend, close=lambda backend: backend.close())
+s3_client = services.register("s3_client", create_s3_client)
+token_counter = services.register("token_counter", lambda: load_token_counter(EMBED_TOKENIZER))
+
+def count_tokens(text: str) -> int:
+    return token_counter.get()(text)
 
-# Connect to the index
-index = pc.Index(INDEX_NAME)
+document_registry = DocumentRegistry(DOCUMENT_REGISTRY_PATH, EMBEDDING_MODEL)
 
 #model = SentenceTransformer('all-MiniLM-L12-v2')
 
-app = FastAPI()
+job_manager = JobManager(max_workers=INGEST_WORKERS)
+ingest_lock = DocumentLock(INGEST_LOCK_DIR)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled keep-alive client shared by every NVIDIA call
+    app.state.nvidia_client = NvidiaClient(
+        max_connections=NVIDIA_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=NVIDIA_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=NVIDIA_HTTP_KEEPALIVE_EXPIRY,
+        timeout=NVIDIA_HTTP_TIMEOUT,
+        retries=NVIDIA_HTTP_RETRIES,
+        backoff=NVIDIA_HTTP_BACKOFF
+    )
+    # Warm the lazy services without holding up startup; /ready reports when they are done
+    warm_task = asyncio.create_task(services.warm()) if WARM_SERVICES_ON_STARTUP else None
+    try:
+        yield
+    finally:
+        if warm_task is not None:
+            warm_task.cancel()
+        await job_manager.shutdown()
+        await app.state.nvidia_client.aclose()
+        await run_in_threadpool(snowflake_pool.close)
+        pdf_extractor.shutdown()
+        query_cache.close()
+        summary_cache.close()
+        keyword_index.close()
+        services.close()
+        document_registry.close()
+
+def get_nvidia_client(request: Request) -> NvidiaClient:
+    return request.app.state.nvidia_client
+
+app = FastAPI(lifespan=lifespan)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
+pdf_extractor = PdfTextExtractor(
+    max_workers=PDF_EXTRACT_WORKERS or None,
+    min_pages_for_pool=PDF_EXTRACT_MIN_PAGES
+)
+text_cache = ExtractedTextCache(TEXT_CACHE_DIR, max_bytes=TEXT_CACHE_MAX_MB * 1024 * 1024)
+query_cache = QueryEmbeddingCache(max_entries=QUERY_CACHE_SIZE, persist_path=QUERY_CACHE_PATH)
+summary_cache = SummaryCache(SUMMARY_CACHE_PATH)
+keyword_index = BM25Store(KEYWORD_INDEX_DIR)
+retrieval_counts = {"vector": 0, "lexical": 0, "hybrid": 0}
+presigned_urls = PresignedUrlCache(
+    s3_client,
+    expires_in=3600,
+    safety_margin=PRESIGNED_URL_SAFETY_MARGIN,
+    max_entries=PRESIGNED_URL_CACHE_SIZE
 )
 
 # Snowflake connection
 def get_snowflake_connection():
+    # Imported on first connection; the connector adds a noticeable share of import time
+    import snowflake.connector
     return snowflake.connector.connect(
         user=SNOWFLAKE_USER,
         password=SNOWFLAKE_PASSWORD,
@@ -100,6 +236,19 @@ def get_snowflake_connection():
         database=SNOWFLAKE_DATABASE,
     )
 
+snowflake_pool = SnowflakePool(
+    get_snowflake_connection,
+    max_size=SNOWFLAKE_POOL_SIZE,
+    max_idle=SNOWFLAKE_POOL_MAX_IDLE,
+    health_check_after=SNOWFLAKE_POOL_HEALTH_CHECK_AFTER,
+    acquire_timeout=SNOWFLAKE_POOL_TIMEOUT
+)
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    logger.error(f"Snowflake pool exhausted: {str(exc)}")
+    return JSONResponse(status_code=503, content={"detail": "Database is busy, please retry shortly"})
+
 # User model and validation
 class User(BaseModel):
     username: str
@@ -111,6 +260,8 @@ class PdfLink(BaseModel):
 
 class FileKey(BaseModel):
     file_key: str
+    # "quick" summarizes the opening of the document, "full" map-reduces every section
+    mode: Literal["quick", "full"] = "quick"
 
 # JWT Token creation
 def create_access_token(data: dict):
@@ -131,51 +282,74 @@ def validate_password(password: str) -> bool:
     pattern = r'^(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$'
     return bool(re.match(pattern, password))
 
-def chunk_text(text, chunk_size=15000, overlap=500):
-    sentences = sent_tokenize(text)
-    chunks = []
-    current_chunk = []
-    current_size = 0
-    
-    for sentence in sentences:
-        if current_size + len(sentence) > chunk_size and current_chunk:
-            chunks.append(" ".join(current_chunk))
-            current_chunk = current_chunk[-overlap:]
-            current_size = sum(len(s) for s in current_chunk)
-        
-        current_chunk.append(sentence)
-        current_size += len(sentence)
-    
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
-    
-    return chunks
-
 # Fetch PDF info from Snowflake
 def fetch_pdf_info_from_snowflake():
-    conn = get_snowflake_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT Title, Image_Link, PDF_Link FROM CFA_NEW")
-        pdf_info = cursor.fetchall()
-        return [{"Title": row[0], "Image_Link": row[1], "PDF_Link": row[2]} for row in pdf_info]
-    finally:
-        cursor.close()
-        conn.close()
+    with snowflake_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT Title, Image_Link, PDF_Link FROM CFA_NEW")
+            pdf_info = cursor.fetchall()
+            return [{"Title": row[0], "Image_Link": row[1], "PDF_Link": row[2]} for row in pdf_info]
+        finally:
+            cursor.close()
 
-def check_existing_embeddings(document_id: str):
+def fetch_pdf_dates_from_s3(pdf_links):
+    """Map s3:// PDF links to the time the DAG uploaded them"""
+    dates = {}
+    buckets = {link[5:].split('/', 1)[0] for link in pdf_links if link and link.startswith('s3://')}
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for bucket in buckets:
+        for page in paginator.paginate(Bucket=bucket):
+            for obj in page.get('Contents', []):
+                dates[f"s3://{bucket}/{obj['Key']}"] = obj['LastModified'].isoformat()
+    return dates
+
+def load_catalog():
+    # CFA_NEW has no publication date, so the S3 upload time stands in for sort=date
+    pdf_info = fetch_pdf_info_from_snowflake()
     try:
-        # Query Pinecone to check for existing embeddings with the given document_id prefix
-        query_response = index.query(
-            vector=[0] * 1024,  # Dummy vector
-            top_k=1,
-            include_metadata=True,
-            filter={"document_id": {"$eq": document_id}}  # Filter based on document_id
-        )
-        return len(query_response['matches']) > 0
+        dates = fetch_pdf_dates_from_s3([pdf['PDF_Link'] for pdf in pdf_info])
     except Exception as e:
-        logger.error(f"Error checking existing embeddings: {str(e)}")
-        return False
+        logger.warning(f"Could not list PDF upload dates from S3: {str(e)}")
+        dates = {}
+    for pdf in pdf_info:
+        pdf['Date'] = dates.get(pdf['PDF_Link'])
+    return pdf_info
+
+catalog_cache = CatalogCache(load_catalog, ttl=CATALOG_CACHE_TTL)
+
+def insert_user(username: str, password: str) -> bool:
+    """Create a user, returning False if the username is already taken"""
+    with snowflake_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT COUNT(*) FROM Users WHERE username = %s", (username,))
+            if cursor.fetchone()[0] > 0:
+                return False
+
+            hashed_password = get_password_hash(password)
+            cursor.execute("INSERT INTO Users (username, password) VALUES (%s, %s)", (username, hashed_password))
+            conn.commit()
+            return True
+        finally:
+            cursor.close()
+
+def authenticate_user(username: str, password: str) -> bool:
+    with snowflake_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT password FROM Users WHERE username = %s", (username,))
+            user = cursor.fetchone()
+        finally:
+            cursor.close()
+    return bool(user) and verify_password(password, user[0])
+
+def check_existing_embeddings(document_id: str, pdf_link: str) -> bool:
+    # Documents indexed before the registry existed are found in the vector store once, then recorded
+    if document_registry.get(document_id) is None and vector_backend.exists(document_id):
+        document_registry.mark_indexed(document_id, chunk_count=None, pdf_link=pdf_link)
+        return True
+    return False
 
 # User registration endpoint
 @app.post("/register")
@@ -188,293 +362,705 @@ async def register(user: User):
             detail="Password must be at least 8 characters long, contain a digit, an uppercase letter, and a special character"
         )
 
-    conn = get_snowflake_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT COUNT(*) FROM Users WHERE username = %s", (user.username,))
-        if cursor.fetchone()[0] > 0:
-            raise HTTPException(status_code=400, detail="Username already exists")
-
-        hashed_password = get_password_hash(user.password)
-        cursor.execute("INSERT INTO Users (username, password) VALUES (%s, %s)", (user.username, hashed_password))
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
+    # Snowflake round trips and bcrypt hashing both block, so keep them off the event loop
+    if not await run_in_threadpool(insert_user, user.username, user.password):
+        raise HTTPException(status_code=400, detail="Username already exists")
    
     return {"message": "User registered successfully"}
 
 # User login endpoint
 @app.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    conn = get_snowflake_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT password FROM Users WHERE username = %s", (form_data.username,))
-        user = cursor.fetchone()
-    finally:
-        cursor.close()
-        conn.close()
-
-    if not user or not verify_password(form_data.password, user[0]):
+    if not await run_in_threadpool(authenticate_user, form_data.username, form_data.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
    
     access_token = create_access_token(data={"sub": form_data.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
+# Readiness endpoint: which lazily initialized services are warm
+@app.get("/ready")
+async def ready():
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if services.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"ready": services.ready, "services": services.status()}
+    )
+
+# Backend metrics endpoint
+@app.get("/metrics", dependencies=[Depends(oauth2_scheme)])
+async def get_metrics():
+    return {
+        "snowflake_pool": snowflake_pool.metrics(),
+        "catalog_cache": catalog_cache.stats(),
+        "presigned_urls": presigned_urls.stats(),
+        "text_cache": text_cache.stats(),
+        "query_cache": query_cache.stats(),
+        "summary_cache": summary_cache.stats(),
+        "vector_backend": vector_backend.stats() if vector_backend.ready else None,
+        "keyword_index": keyword_index.stats(),
+        "retrieval": retrieval_counts,
+        "document_registry": document_registry.stats()
+    }
+
+def not_modified(request: Request, etag: str):
+    return etag_matches(request.headers.get("if-none-match"), etag)
+
+IMAGE_FIELDS = ("Title", "Image_Link", "Date")
+PDF_FIELDS = ("Title", "Image_Link", "PDF_Link", "Date", "url", "image_url")
+
+def parse_fields(fields: Optional[str], allowed):
+    """Validate a comma separated fields= projection, defaulting to every field"""
+    if not fields:
+        return list(allowed)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return selected
+
+def catalog_page(catalog, sort: str, order: str, after: Optional[str], limit: Optional[int],
+                 require: Optional[str] = None):
+    try:
+        return paginate(catalog, sort=sort, descending=order == "desc", after=after, limit=limit, require=require)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def catalog_response(request: Request, content, total: int, next_cursor: Optional[str]):
+    """JSON response with pagination headers, or 304 if the client's copy is current"""
+    etag = make_etag(json.dumps(content, sort_keys=True), next_cursor)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "X-Total-Count": str(total)}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(content=content, headers=headers)
+
 # Retrieve images endpoint
 @app.get("/images", dependencies=[Depends(oauth2_scheme)])
-async def get_images():
-    pdf_info = fetch_pdf_info_from_snowflake()
-    return [{"Title": pdf['Title'], "Image_Link": pdf['Image_Link']} for pdf in pdf_info if pdf['Image_Link']]
+async def get_images(request: Request,
+                     limit: Optional[int] = Query(None, ge=1, le=500),
+                     after: Optional[str] = None,
+                     sort: str = Query("title", pattern="^(title|date)$"),
+                     order: str = Query("asc", pattern="^(asc|desc)$"),
+                     fields: Optional[str] = None):
+    selected = parse_fields(fields, IMAGE_FIELDS)
+    catalog = await run_in_threadpool(catalog_cache.get)
+    # Rows without a cover are skipped before the page is cut, so pages come back full
+    page, next_cursor = catalog_page(catalog, sort, order, after, limit, require="Image_Link")
+    images = [{field: pdf.get(field) for field in selected} for pdf in page]
+    total = len(catalog.sorted_view(sort, "Image_Link")[1])
+    return catalog_response(request, images, total, next_cursor)
 
-# Retrieve PDFs endpoint
-@app.get("/pdfs", dependencies=[Depends(oauth2_scheme)])
-async def get_pdfs():
-    pdf_info = fetch_pdf_info_from_snowflake()
+def build_pdf_rows(rows, fields=PDF_FIELDS):
+    """Project catalog rows, presigning PDF and cover image URLs only when they are requested"""
     default_image_url = "https://as1.ftcdn.net/v2/jpg/02/17/88/52/1000_F_217885295_7a4cZ28RGP15RPzeRhFSYx49YMwk5Y53.jpg"
-    
-    for pdf in pdf_info:
-        if pdf['PDF_Link'].startswith('s3://'):
-            bucket, key = pdf['PDF_Link'][5:].split('/', 1)
-            pdf['url'] = s3_client.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": bucket, "Key": key},
-                ExpiresIn=3600
-            )
-        else:
-            pdf['url'] = pdf['PDF_Link']
-        
-        if pdf['Image_Link'] and pdf['Image_Link'] != 'N/A':
-            if pdf['Image_Link'].startswith('s3://'):
-                bucket, key = pdf['Image_Link'][5:].split('/', 1)
-                pdf['image_url'] = s3_client.generate_presigned_url(
-                    "get_object",
-                    Params={"Bucket": bucket, "Key": key},
-                    ExpiresIn=3600
-                )
+    pdf_info = []
+
+    for row in rows:
+        pdf = {field: row.get(field) for field in fields if field not in ("url", "image_url")}
+        if "url" in fields:
+            pdf['url'] = presigned_urls.resolve(row['PDF_Link'])
+        if "image_url" in fields:
+            if row['Image_Link'] and row['Image_Link'] != 'N/A':
+                pdf['image_url'] = presigned_urls.resolve(row['Image_Link'])
             else:
-                pdf['image_url'] = pdf['Image_Link']
-        else:
-            pdf['image_url'] = default_image_url
-    
+                pdf['image_url'] = default_image_url
+        pdf_info.append(pdf)
+
     return pdf_info
 
-# Summarize endpoint
-@app.post("/summarize")
-async def summarize(file_key: FileKey, token: str = Depends(oauth2_scheme)):
+# Retrieve PDFs endpoint
+@app.get("/pdfs", dependencies=[Depends(oauth2_scheme)])
+async def get_pdfs(request: Request,
+                   limit: Optional[int] = Query(None, ge=1, le=500),
+                   after: Optional[str] = None,
+                   sort: str = Query("title", pattern="^(title|date)$"),
+                   order: str = Query("asc", pattern="^(asc|desc)$"),
+                   fields: Optional[str] = None):
+    selected = parse_fields(fields, PDF_FIELDS)
+    catalog = await run_in_threadpool(catalog_cache.get)
+
+    # Only the requested page is signed; without a limit the whole catalog is returned
+    page, next_cursor = catalog_page(catalog, sort, order, after, limit)
+    pdf_info = await run_in_threadpool(build_pdf_rows, page, selected)
+
+    # Cached presigned URLs stay stable until close to expiry, so hashing the body
+    # only revalidates copies whose links still have at least the safety margin left
+    return catalog_response(request, pdf_info, len(catalog.rows), next_cursor)
+
+# Drop the cached catalog, e.g. after the daily DAG has loaded new publications
+@app.post("/catalog/invalidate", dependencies=[Depends(oauth2_scheme)])
+async def invalidate_catalog():
+    catalog_cache.invalidate()
+    return {"message": "Catalog cache invalidated"}
+
+def s3_location(pdf_link: str):
+    """Return (bucket, key) for s3:// links and S3 object URLs such as presigned links, else None"""
+    if pdf_link.startswith('s3://'):
+        bucket, key = pdf_link[5:].split('/', 1)
+        return bucket, key
+    parsed = urlparse(pdf_link)
+    match = re.match(r'^(?P<bucket>[^.]+)\.s3[.-](?:[a-z0-9-]+\.)?amazonaws\.com$', parsed.netloc)
+    if match and parsed.path.strip('/'):
+        return match.group('bucket'), unquote(parsed.path.lstrip('/'))
+    return None
+
+def extract_pdf_pages(pdf_content: bytes, progress=None) -> list:
+    # Large documents are split across worker processes, small ones stay in-process
+    return pdf_extractor.extract_pages(pdf_content, progress=progress)
+
+def download_pdf(pdf_link: str) -> bytes:
+    logger.info("Fetching PDF from URL")
+    response = requests.get(pdf_link)
+    if response.status_code != 200:
+        raise FileNotFoundError(f"PDF file not found: {pdf_link}")
+    logger.info("Successfully fetched PDF from URL")
+    return response.content
+
+def load_pdf_pages(pdf_link: str, on_extract=None, progress=None, content_key: Optional[str] = None) -> list:
+    """Per-page text of a PDF, parsed at most once per content version.
+
+    S3 objects are looked up by ETag before anything is downloaded; other URLs
+    are downloaded and looked up by a hash of their bytes. Callers that already
+    have an S3 object's s3_content_key pass it as content_key to skip the HEAD request.
+    """
+    location = s3_location(pdf_link)
+    if location:
+        bucket, key = location
+        if content_key is None:
+            try:
+                head = s3_client.head_object(Bucket=bucket, Key=key)
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                    raise FileNotFoundError(f"PDF file not found: {pdf_link}")
+                if pdf_link.startswith('s3://'):
+                    raise
+                head = None  # Not readable with our credentials, use the URL itself
+            if head:
+                content_key = text_cache.key_for_etag(head['ETag'], head['ContentLength'])
+        if content_key:
+            pages = text_cache.get(content_key)
+            if pages is not None:
+                logger.info(f"Using cached text for s3://{bucket}/{key}")
+                return pages
+            logger.info("Fetching PDF from S3")
+            try:
+                response = s3_client.get_object(Bucket=bucket, Key=key)
+            except s3_client.exceptions.NoSuchKey:
+                raise FileNotFoundError(f"PDF file not found: {pdf_link}")
+            pdf_content = response['Body'].read()
+            cache_key = text_cache.key_for_etag(response['ETag'], response['ContentLength'])
+        else:
+            pdf_content = download_pdf(pdf_link)
+            cache_key = text_cache.key_for_content(pdf_content)
+    else:
+        pdf_content = download_pdf(pdf_link)
+        cache_key = text_cache.key_for_content(pdf_content)
+        pages = text_cache.get(cache_key)
+        if pages is not None:
+            logger.info(f"Using cached text for {pdf_link}")
+            return pages
+
+    if on_extract:
+        on_extract()
+    logger.info("Extracting text from PDF")
+    pages = extract_pdf_pages(pdf_content, progress=progress)
+    text_cache.put(cache_key, pages)
+    return pages
+
+def s3_content_key(bucket: str, key: str) -> str:
+    """Content identity of an S3 object from its ETag and size, without downloading it"""
+    try:
+        head = s3_client.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+            raise FileNotFoundError(f"PDF file not found: s3://{bucket}/{key}")
+        raise
+    return text_cache.key_for_etag(head['ETag'], head['ContentLength'])
+
+# Everything below shapes the summary and is part of its cache key
+SUMMARY_MODEL = "meta/llama-3.1-8b-instruct"
+SUMMARY_PROMPT_TEMPLATE = "Summarize the following text:\n\n{text}"
+SUMMARY_INPUT_CHARS = 2000
+SUMMARY_PARAMS = {"max_tokens": 200, "temperature": 0.5}
 
-    # Fetch PDF from S3
+def summary_settings(mode: str):
+    """Prompt templates and parameters that determine a summary in the given mode"""
+    if mode == "full":
+        return f"{MAP_PROMPT_TEMPLATE}\n---\n{REDUCE_PROMPT_TEMPLATE}", {
+            **SUMMARY_PARAMS, "mode": mode,
+            "section_tokens": SUMMARY_SECTION_TOKENS, "fanout": SUMMARY_REDUCE_FANOUT
+        }
+    return SUMMARY_PROMPT_TEMPLATE, {**SUMMARY_PARAMS, "input_chars": SUMMARY_INPUT_CHARS}
+
+async def summary_cache_entry(file_key: FileKey):
+    """Content key, cache key and cached summary (or None) for a summarize request"""
     s3_key = file_key.file_key
     try:
-        response = s3_client.get_object(Bucket=AWS_BUCKET_NAME, Key=s3_key)
-        pdf_content = response['Body'].read()
-        pdf_reader = PdfReader(io.BytesIO(pdf_content))
-        pdf_text = "".join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
+        content_key = await run_in_threadpool(s3_content_key, AWS_BUCKET_NAME, s3_key)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"PDF file not found: {s3_key}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading PDF from S3: {str(e)}")
 
-        if not pdf_text:
-            raise HTTPException(status_code=400, detail="PDF content is empty or could not be extracted.")
+    prompt_template, params = summary_settings(file_key.mode)
+    cache_key = summary_cache.key_for(s3_key, content_key, SUMMARY_MODEL, prompt_template, params)
+    return content_key, cache_key, await run_in_threadpool(summary_cache.get, cache_key)
 
-    except s3_client.exceptions.NoSuchKey:
+async def load_summary_text(s3_key: str, content_key: str) -> str:
+    # Fetch PDF from S3; content_key comes from the summary cache lookup, so the object is not HEADed again
+    try:
+        pages = await run_in_threadpool(
+            load_pdf_pages, f"s3://{AWS_BUCKET_NAME}/{s3_key}", content_key=content_key
+        )
+        pdf_text = "".join(pages)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"PDF file not found: {s3_key}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading PDF from S3: {str(e)}")
 
-    # Call NVIDIA's API for summarization
-    nvidia_api_url = "https://integrate.api.nvidia.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {NVIDIA_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    # Limit text to the first 4000 characters for the prompt
-    prompt_text = f"Summarize the following text:\n\n{pdf_text[:2000]}"
-    payload = {
-        "model": "meta/llama-3.1-8b-instruct",
+    if not pdf_text:
+        raise HTTPException(status_code=400, detail="PDF content is empty or could not be extracted.")
+    return pdf_text
+
+def quick_summary_payload(pdf_text: str) -> dict:
+    # Limit text to the first 2000 characters for the prompt
+    prompt_text = SUMMARY_PROMPT_TEMPLATE.format(text=pdf_text[:SUMMARY_INPUT_CHARS])
+    return {
+        "model": SUMMARY_MODEL,
         "messages": [{"role": "user", "content": prompt_text}],
-        "max_tokens": 200,  # Reduced tokens
-        "temperature": 0.5
+        **SUMMARY_PARAMS
         }
 
-    try:
-        nvidia_response = requests.post(nvidia_api_url, json=payload, headers=headers)
-        nvidia_response.raise_for_status()  # This will raise an exception for non-200 status codes
-        response_data = nvidia_response.json()
+def summary_sections(pdf_text: str) -> list:
+    nltk_data.get()  # sentence splitting needs the punkt models
+    return split_sections(pdf_text, SUMMARY_SECTION_TOKENS, count_tokens)
 
-        # Extract summary text from response
-        summary = response_data.get("choices", [{}])[0].get("message", {}).get("content", "No summary generated")
+def summary_map_reduce_options() -> dict:
+    return {
+        "max_concurrency": SUMMARY_MAX_CONCURRENCY,
+        "reduce_max_tokens": SUMMARY_SECTION_TOKENS,
+        "fanout": SUMMARY_REDUCE_FANOUT,
+        "count_tokens": count_tokens
+    }
 
-        # Check if summary is generic or empty
-        if summary.strip().lower() in ["no summary generated", ""]:
-            raise HTTPException(status_code=500, detail="Summary generation failed or returned a generic response.")
+# Summarize endpoint
+@app.post("/summarize")
+async def summarize(file_key: FileKey, token: str = Depends(oauth2_scheme),
+                    nvidia: NvidiaClient = Depends(get_nvidia_client)):
+
+    s3_key = file_key.file_key
+    content_key, cache_key, summary = await summary_cache_entry(file_key)
+    if summary is not None:
+        logger.info(f"Using cached summary for {s3_key}")
+        return {"summary": summary}
+
+    pdf_text = await load_summary_text(s3_key, content_key)
 
+    if file_key.mode == "full":
+        summary = await summarize_full_text(nvidia, pdf_text)
+        await run_in_threadpool(summary_cache.put, cache_key, s3_key, content_key, summary)
         return {"summary": summary}
 
-    except requests.RequestException as e:
+    # Call NVIDIA's API for summarization
+    try:
+        response_data = await nvidia.chat_completion(quick_summary_payload(pdf_text), NVIDIA_API_KEY)
+    except NvidiaAPIError as e:
         logger.error(f"NVIDIA API request failed: {str(e)}")
-        logger.error(f"NVIDIA API response: {nvidia_response.text}")
+        logger.error(f"NVIDIA API response: {e.body}")
         raise HTTPException(status_code=500, detail=f"Failed to generate summary: {str(e)}")
-    except ValueError as e:
-        logger.error(f"Invalid JSON response from NVIDIA API: {str(e)}")
-        logger.error(f"NVIDIA API response: {nvidia_response.text}")
-        raise HTTPException(status_code=500, detail="Invalid response format from NVIDIA API")
-    except Exception as e:
-        logger.error(f"Unexpected error in summarize endpoint: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-@app.post("/embed")
-async def create_embedding(pdf_link: PdfLink, token: str = Depends(oauth2_scheme)):
-    logger.info(f"Starting embedding process for PDF: {pdf_link.pdf_link}")
+    # Extract summary text from response
+    summary = response_data.get("choices", [{}])[0].get("message", {}).get("content", "No summary generated")
+
+    # Check if summary is generic or empty
+    if summary.strip().lower() in ["no summary generated", ""]:
+        raise HTTPException(status_code=500, detail="Summary generation failed or returned a generic response.")
+
+    await run_in_threadpool(summary_cache.put, cache_key, s3_key, content_key, summary)
+    return {"summary": summary}
+
+async def summarize_full_text(nvidia: NvidiaClient, pdf_text: str) -> str:
+    """Summarize every section of a document concurrently and merge the results hierarchically"""
+    sections = await run_in_threadpool(summary_sections, pdf_text)
     try:
-        
-        pdf_title = pdf_link.pdf_link.split('/')[-1].split('.')[0]
-        document_id = f"pdf-{pdf_title}"
-        
-        # Check if embeddings already exist
-        if check_existing_embeddings(document_id):
-            logger.info(f"Embeddings already exist for document: {document_id}")
-            return {"message": "Embeddings already exist", "document_id": document_id}
-        
-        # Fetch PDF content
-        if pdf_link.pdf_link.startswith('s3://'):
-            logger.info("Fetching PDF from S3")
-            bucket, key = pdf_link.pdf_link[5:].split('/', 1)
-            try:
-                response = s3_client.get_object(Bucket=bucket, Key=key)
-                pdf_content = response['Body'].read()
-                logger.info("Successfully fetched PDF from S3")
-            except s3_client.exceptions.NoSuchKey:
-                logger.error(f"PDF file not found in S3: {pdf_link.pdf_link}")
-                raise HTTPException(status_code=404, detail=f"PDF file not found: {pdf_link.pdf_link}")
-        else:
-            logger.info("Fetching PDF from URL")
-            response = requests.get(pdf_link.pdf_link)
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch PDF from URL: {pdf_link.pdf_link}")
-                raise HTTPException(status_code=404, detail=f"PDF file not found: {pdf_link.pdf_link}")
-            pdf_content = response.content
-            logger.info("Successfully fetched PDF from URL")
-
-        # Extract text from PDF
-        logger.info("Extracting text from PDF")
-        pdf_reader = PdfReader(io.BytesIO(pdf_content))
-        pdf_text = "".join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
-        if not pdf_text:
-            logger.error("PDF content is empty or could not be extracted")
-            raise HTTPException(status_code=400, detail="PDF content is empty or could not be extracted.")
-        logger.info(f"Successfully extracted {len(pdf_text)} characters from PDF")
-
-        # Chunk the PDF text
-        logger.info("Chunking PDF text")
-        chunks = chunk_text(pdf_text)
-        logger.info(f"Created {len(chunks)} chunks from PDF text")
-
-        nvidia_api_url = "https://integrate.api.nvidia.com/v1/embeddings"
-        headers = {
-            "Authorization": f"Bearer {NVIDIA_API_KEY_VECTOR}",
-            "Content-Type": "application/json"
+        summary, stats = await map_reduce_summary(
+            nvidia, sections, NVIDIA_API_KEY, SUMMARY_MODEL, SUMMARY_PARAMS, **summary_map_reduce_options()
+        )
+    except SummarizationError as e:
+        logger.error(f"Full-document summarization failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate summary: {str(e)}")
+    logger.info(f"Summarized {stats['sections']} sections in {stats['levels']} levels with {stats['calls']} calls")
+    return summary
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def event_stream(events) -> StreamingResponse:
+    # Ask proxies not to buffer, so every event reaches the client as soon as it is sent
+    return StreamingResponse(
+        events, media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Streaming summarize endpoint: "token" events carry summary text as it is generated,
+# followed by "done" with the full summary or "error" with a detail message
+@app.post("/summarize/stream")
+async def summarize_stream(file_key: FileKey, token: str = Depends(oauth2_scheme),
+                           nvidia: NvidiaClient = Depends(get_nvidia_client)):
+    s3_key = file_key.file_key
+    content_key, cache_key, cached = await summary_cache_entry(file_key)
+    if cached is not None:
+        logger.info(f"Using cached summary for {s3_key}")
+
+        async def replay():
+            yield sse_event("token", {"text": cached})
+            yield sse_event("done", {"summary": cached, "cached": True})
+        return event_stream(replay())
+
+    pdf_text = await load_summary_text(s3_key, content_key)
+    if file_key.mode == "full":
+        sections = await run_in_threadpool(summary_sections, pdf_text)
+
+    async def generate():
+        parts = []
+        try:
+            if file_key.mode == "full":
+                yield sse_event("status", {"message": f"Summarizing {len(sections)} sections"})
+                async for item in stream_map_reduce_summary(
+                        nvidia, sections, NVIDIA_API_KEY, SUMMARY_MODEL, SUMMARY_PARAMS,
+                        **summary_map_reduce_options()):
+                    if isinstance(item, dict):
+                        logger.info(f"Summarized {item['sections']} sections in {item['levels']} levels")
+                        continue
+                    parts.append(item)
+                    yield sse_event("token", {"text": item})
+            else:
+                async for delta in nvidia.stream_chat_completion(quick_summary_payload(pdf_text), NVIDIA_API_KEY):
+                    parts.append(delta)
+                    yield sse_event("token", {"text": delta})
+        except (NvidiaAPIError, SummarizationError) as e:
+            logger.error(f"Streaming summary failed: {str(e)}")
+            yield sse_event("error", {"detail": f"Failed to generate summary: {str(e)}"})
+            return
+
+        summary = "".join(parts)
+        if not summary.strip():
+            yield sse_event("error", {"detail": "Summary generation failed or returned a generic response."})
+            return
+        await run_in_threadpool(summary_cache.put, cache_key, s3_key, content_key, summary)
+        yield sse_event("done", {"summary": summary, "cached": False})
+
+    return event_stream(generate())
+
+def chunk_document(pdf_text: str) -> list:
+    nltk_data.get()  # sentence splitting needs the punkt models
+    return list(iter_chunks(
+        pdf_text,
+        max_tokens=CHUNK_MAX_TOKENS,
+        overlap=CHUNK_OVERLAP,
+        overlap_unit=CHUNK_OVERLAP_UNIT,
+        count_tokens=count_tokens
+    ))
+
+async def run_ingestion(job, nvidia: NvidiaClient):
+    """Fetch, parse, chunk, embed and upsert one PDF, reporting progress on the job"""
+    document_id = job.document_id
+    logger.info(f"Starting embedding process for PDF: {job.pdf_link}")
+
+    # Fetch and extract text from PDF, unless this content was parsed before
+    job.set_stage("fetching")
+    try:
+        pages = await job_manager.run_blocking(
+            load_pdf_pages,
+            job.pdf_link,
+            on_extract=lambda: job.set_stage("extracting"),
+            progress=lambda done: job.update(pages_extracted=done)
+        )
+    except FileNotFoundError as e:
+        raise IngestionError(str(e))
+    pdf_text = "".join(pages)
+    if not pdf_text:
+        raise IngestionError("PDF content is empty or could not be extracted.")
+    logger.info(f"Successfully extracted {len(pdf_text)} characters from PDF")
+    content_hash = hashlib.sha256(pdf_text.encode("utf-8")).hexdigest()
+
+    # Chunk the PDF text
+    job.set_stage("chunking")
+    logger.info("Chunking PDF text")
+    chunks = await job_manager.run_blocking(chunk_document, pdf_text)
+    job.update(chunks_total=len(chunks))
+    logger.info(f"Created {len(chunks)} chunks from PDF text")
+
+    # Embed the chunks in batches, several batches in flight at once
+    job.set_stage("embedding")
+    logger.info(f"Generating embeddings for {len(chunks)} chunks in batches of {EMBED_BATCH_SIZE}")
+    # Chunks are sized to the model's token budget, so each one is embedded whole
+    try:
+        vectors = await embed_texts(
+            nvidia,
+            chunks,
+            NVIDIA_API_KEY_VECTOR,
+            batch_size=EMBED_BATCH_SIZE,
+            max_concurrency=EMBED_MAX_CONCURRENCY,
+            progress=lambda done: job.update(chunks_embedded=done)
+        )
+    except EmbeddingError as e:
+        raise IngestionError(f"Failed to generate embeddings: {str(e)}")
+
+    chunk_embeddings = [
+        {
+            "id": f"{document_id}-chunk-{i}",
+            "values": vector,
+            "metadata": {"text": chunk, "document_id": document_id}
         }
+        for i, (chunk, vector) in enumerate(zip(chunks, vectors))
+    ]
 
-        chunk_embeddings = []
-        logger.info("Generating embeddings for chunks")
-        for i, chunk in enumerate(chunks):
-            test_chunk = chunk[:1000]  # Use the first 1000 characters of the chunk
-            payload = {
-                "model": "nvidia/nv-embedqa-e5-v5",
-                "input": [test_chunk],
-                "encoding_format": "float",
-                "input_type": "query"
-            }
-            try:
-                nvidia_response = requests.post(nvidia_api_url, json=payload, headers=headers)
-                nvidia_response.raise_for_status()
-                response_data = nvidia_response.json()
-                embeddings = response_data["data"][0]["embedding"]
-                if not embeddings:
-                    logger.error(f"Embedding generation failed for chunk {i}")
-                    raise HTTPException(status_code=500, detail=f"Embedding generation failed for chunk {i}")
-                chunk_embeddings.append({
-                    "id": f"{document_id}-chunk-{i}",
-                    "values": embeddings,
-                    "metadata": {"text": chunk[:500], "document_id": document_id}
-                    })
-                logger.info(f"Successfully generated embedding for chunk {i}")
-            except requests.RequestException as e:
-                logger.error(f"Failed to generate embeddings for chunk {i}: {str(e)}")
-                raise HTTPException(status_code=500, detail=f"Failed to generate embeddings for chunk {i}: {str(e)}")
-            except ValueError:
-                logger.error(f"Invalid response format from NVIDIA API for chunk {i}")
-                raise HTTPException(status_code=500, detail=f"Invalid response format from NVIDIA API for chunk {i}")
-        
-        # Function to upsert in batches to avoid exceeding request size
-        def upsert_in_batches(embeddings, index, batch_size=50):
-            for i in range(0, len(embeddings), batch_size):
-                batch = embeddings[i:i + batch_size]
-                try:
-                    logger.info(f"Upserting batch {i // batch_size + 1} of embeddings to Pinecone")
-                    index.upsert(vectors=batch)
-                    logger.info(f"Successfully upserted batch {i // batch_size + 1}")
-                except Exception as e:
-                    logger.error(f"Failed to upsert batch {i // batch_size + 1}: {str(e)}")
-                    raise HTTPException(status_code=500, detail=f"Failed to upsert embeddings batch: {str(e)}")
-                
-        # Upsert embeddings in batches
-        logger.info("Upserting embeddings to Pinecone in batches")
-        upsert_in_batches(chunk_embeddings, index, batch_size=50)
-
-        return {"message": f"Embeddings created and stored in Pinecone successfully for {len(chunks)} chunks", "document_id": document_id}
-    except Exception as e:
-        logger.error(f"Unexpected error in create_embedding: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    # Upsert embeddings in batches
+    job.set_stage("upserting")
+    logger.info(f"Upserting embeddings to the {VECTOR_BACKEND} vector backend")
+    try:
+        # Resolved on the worker thread, so a cold backend never initializes on the event loop
+        await job_manager.run_blocking(
+            lambda: vector_backend.upsert(
+                document_id, chunk_embeddings, progress=lambda done: job.update(chunks_upserted=done)
+            )
+        )
+    except VectorBackendError as e:
+        raise IngestionError(str(e))
+
+    # Keyword index over the same chunks, so lexical questions can be answered without an embedding call
+    job.set_stage("keyword_indexing")
+    try:
+        await job_manager.run_blocking(
+            keyword_index.build, document_id, [item["id"] for item in chunk_embeddings], chunks
+        )
+    except OSError as e:
+        # Vector retrieval still works without it
+        logger.error(f"Failed to build keyword index for {document_id}: {str(e)}")
+
+    return {
+        "message": f"Embeddings created and stored successfully for {len(chunks)} chunks",
+        "document_id": document_id,
+        "chunk_count": len(chunks),
+        "content_hash": content_hash
+    }
+
+async def index_document(job, nvidia: NvidiaClient):
+    """Run ingestion for a job and record the outcome in the document registry"""
+    async with ingest_lock.hold(job.document_id):
+        # Another worker process may have indexed the document while this one waited for the lock
+        if await job_manager.run_blocking(document_registry.refresh, job.document_id):
+            logger.info(f"Document {job.document_id} was indexed by another worker")
+            record = await job_manager.run_blocking(document_registry.get, job.document_id)
+            job.update(chunks_total=record["chunk_count"] or 0)
+            return {"message": "Embeddings already exist", "document_id": job.document_id,
+                    "chunk_count": record["chunk_count"], "content_hash": record["content_hash"]}
+
+        await job_manager.run_blocking(document_registry.mark_indexing, job.document_id, job.pdf_link)
+        try:
+            result = await run_ingestion(job, nvidia)
+        except Exception as e:
+            await job_manager.run_blocking(document_registry.mark_failed, job.document_id, str(e))
+            raise
+        await job_manager.run_blocking(
+            document_registry.mark_indexed, job.document_id, result["chunk_count"], result["content_hash"]
+        )
+        return result
+
+def pdf_link_to_document_id(pdf_link: str) -> str:
+    pdf_title = pdf_link.split('/')[-1].split('.')[0]
+    return f"pdf-{pdf_title}"
+
+async def start_indexing(document_id: str, pdf_link: str, nvidia: NvidiaClient):
+    """Return None if the document is already indexed, otherwise the ingestion job indexing it"""
+    if document_registry.is_indexed(document_id) or \
+            await run_in_threadpool(check_existing_embeddings, document_id, pdf_link):
+        return None
+    return job_manager.submit(document_id, pdf_link, lambda job: index_document(job, nvidia))
+
+@app.post("/embed", status_code=status.HTTP_202_ACCEPTED)
+async def create_embedding(pdf_link: PdfLink, response: Response, token: str = Depends(oauth2_scheme),
+                           nvidia: NvidiaClient = Depends(get_nvidia_client)):
+    document_id = pdf_link_to_document_id(pdf_link.pdf_link)
+
+    # Check if embeddings already exist, from memory for every document indexed through the registry
+    job = await start_indexing(document_id, pdf_link.pdf_link, nvidia)
+    if job is None:
+        logger.info(f"Embeddings already exist for document: {document_id}")
+        response.status_code = status.HTTP_200_OK
+        return {"message": "Embeddings already exist", "document_id": document_id}
+
+    return {"message": "Embedding job queued", "document_id": document_id, "job_id": job.job_id, "status": job.status}
+
+@app.get("/documents/{document_id}", dependencies=[Depends(oauth2_scheme)])
+async def get_document(document_id: str):
+    record = await run_in_threadpool(document_registry.get, document_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Document not found: {document_id}")
+    return record
+
+@app.get("/jobs/{job_id}", dependencies=[Depends(oauth2_scheme)])
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job.to_dict()
+
+RetrievalMode = Literal["vector", "lexical", "hybrid", "auto"]
 
 class ChatRequest(BaseModel):
     user_input: str
     document_id: str
     conversation_history: str = ""
+    mode: Optional[RetrievalMode] = None  # defaults to RETRIEVAL_MODE
 
-@app.post("/chat")
-async def chat(request: ChatRequest, token: str = Depends(oauth2_scheme)):
-    logger.info(f"Received chat request for document: {request.document_id}")
-
+async def query_vector(request: ChatRequest, nvidia: NvidiaClient) -> list:
     # Combine conversation history with current user input
     full_input = f"{request.conversation_history}\nYou: {request.user_input}"
 
-    # Generate embedding for user input (including conversation history)
-    nvidia_api_url = "https://integrate.api.nvidia.com/v1/embeddings"
-    headers = {
-        "Authorization": f"Bearer {NVIDIA_API_KEY_VECTOR}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "model": "nvidia/nv-embedqa-e5-v5",
-        "input": [full_input],
-        "encoding_format": "float",
-        "input_type": "query"
-    }
+    # Generate embedding for user input (including conversation history), reusing it for repeated questions
+    user_vector = query_cache.get(full_input, EMBEDDING_MODEL)
+    if user_vector is None:
+        try:
+            # Truncate from the start so a long history never pushes out the question itself
+            user_vector = (await nvidia.embed([full_input], NVIDIA_API_KEY_VECTOR, EMBEDDING_MODEL, truncate="START"))[0]
+        except (NvidiaAPIError, KeyError) as e:
+            logger.error(f"Error in chat endpoint: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"An error occurred while processing your request: {str(e)}")
+        await run_in_threadpool(query_cache.put, full_input, EMBEDDING_MODEL, user_vector)
+    return user_vector
 
-    try:
-        nvidia_response = requests.post(nvidia_api_url, json=payload, headers=headers)
-        nvidia_response.raise_for_status()
-        response_data = nvidia_response.json()
-        user_vector = response_data["data"][0]["embedding"]
-
-        # Query Pinecone with the user input embedding
-        query_result = index.query(
-            vector=user_vector,
-            top_k=3,  # Retrieve top 3 chunks instead of just 1
-            include_metadata=True,
-            filter={"document_id": request.document_id}
+async def vector_matches(request: ChatRequest, nvidia: NvidiaClient, top_k: int) -> list:
+    user_vector = await query_vector(request, nvidia)
+    # Query the vector backend with the user input embedding
+    return await run_in_threadpool(lambda: vector_backend.query(request.document_id, user_vector, top_k=top_k))
+
+def retrieval_mode(request: ChatRequest) -> str:
+    """Resolve "auto" to a concrete mode; documents without a keyword index always use vector search"""
+    mode = request.mode or RETRIEVAL_MODE
+    if mode == "vector" or not keyword_index.exists(request.document_id):
+        return "vector"
+    if mode == "auto":
+        # Only questions naming identifiers are keyword lookups; ordinary questions keep semantic retrieval
+        return auto_retrieval_mode(
+            request.user_input, lambda terms: keyword_index.covers(request.document_id, terms), LEXICAL_MAX_TERMS
         )
+    return mode
 
-        if query_result['matches']:
-            combined_context = "\n".join([match['metadata']['text'] for match in query_result['matches']])
-            
-            return {
-                "response": f"Based on the context:\n\n{combined_context}\n\n"
-            }
-        else:
-            return {"response": "No relevant information found."}
+async def retrieve_context(request: ChatRequest, nvidia: NvidiaClient) -> list:
+    """Top 3 matches for a chat question, best first"""
+    mode = await run_in_threadpool(retrieval_mode, request)
+    retrieval_counts[mode] += 1
+    logger.info(f"Retrieving context for {request.document_id} with {mode} search")
+
+    # Keyword search uses the question alone; the conversation history would dilute its terms
+    if mode == "lexical":
+        return await run_in_threadpool(keyword_index.search, request.document_id, request.user_input, 3)
+    if mode == "vector":
+        return await vector_matches(request, nvidia, top_k=3)
+    semantic, lexical = await asyncio.gather(
+        vector_matches(request, nvidia, top_k=HYBRID_CANDIDATES),
+        run_in_threadpool(keyword_index.search, request.document_id, request.user_input, HYBRID_CANDIDATES)
+    )
+    return fuse_matches(semantic, lexical, vector_weight=HYBRID_VECTOR_WEIGHT, top_k=3)
+
+def format_answer(matches: list) -> str:
+    if not matches:
+        return "No relevant information found."
+    combined_context = "\n".join([match['metadata']['text'] for match in matches])
+    return f"Based on the context:\n\n{combined_context}\n\n"
+
+@app.post("/chat")
+async def chat(request: ChatRequest, token: str = Depends(oauth2_scheme),
+               nvidia: NvidiaClient = Depends(get_nvidia_client)):
+    logger.info(f"Received chat request for document: {request.document_id}")
+
+    matches = await retrieve_context(request, nvidia)
+    return {"response": format_answer(matches)}
+
+async def answer_events(request: ChatRequest, nvidia: NvidiaClient):
+    """Events of a streamed answer: one "context" event per retrieved chunk, then "done" with the full response"""
+    # Retrieval runs inside the stream so the response starts before the embedding call returns
+    yield sse_event("status", {"message": "Searching the document"})
+    try:
+        matches = await retrieve_context(request, nvidia)
+    except HTTPException as e:
+        yield sse_event("error", {"detail": e.detail})
+        return
+
+    if not matches:
+        yield sse_event("token", {"text": format_answer(matches)})
+    else:
+        yield sse_event("token", {"text": "Based on the context:\n\n"})
+        for match in matches:
+            yield sse_event("context", {"text": match['metadata']['text'], "score": match['score']})
+    yield sse_event("done", {"response": format_answer(matches)})
+
+# Streaming chat endpoint
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, token: str = Depends(oauth2_scheme),
+                      nvidia: NvidiaClient = Depends(get_nvidia_client)):
+    logger.info(f"Received streaming chat request for document: {request.document_id}")
+    return event_stream(answer_events(request, nvidia))
+
+class AskRequest(BaseModel):
+    pdf_link: str
+    question: str
+    conversation_history: str = ""
+    mode: Optional[RetrievalMode] = None
+
+def indexing_status(job) -> dict:
+    if job is None:
+        return {"status": "indexed"}
+    if not job.done:
+        return {"status": "indexing", "job_id": job.job_id, "stage": job.stage,
+                "chunks_total": job.chunks_total, "chunks_embedded": job.chunks_embedded}
+    return {"status": "indexed_now" if job.status == "completed" else "failed", "job_id": job.job_id,
+            "chunk_count": job.chunks_total, "error": job.error}
+
+# Ask endpoint: index the PDF if needed, then answer the question, in one request
+@app.post("/ask")
+async def ask(request: AskRequest, response: Response, token: str = Depends(oauth2_scheme),
+              nvidia: NvidiaClient = Depends(get_nvidia_client)):
+    document_id = pdf_link_to_document_id(request.pdf_link)
+    logger.info(f"Received ask request for document: {document_id}")
+
+    job = await start_indexing(document_id, request.pdf_link, nvidia)
+    if job is not None and not await job_manager.wait(job, ASK_INDEX_TIMEOUT):
+        # Still indexing: the client can follow the job and ask again
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"answer": None, "document_id": document_id, "indexing": indexing_status(job)}
+    if job is not None and job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Failed to create embeddings for the PDF: {job.error}")
+
+    chat_request = ChatRequest(user_input=request.question, document_id=document_id,
+                               conversation_history=request.conversation_history, mode=request.mode)
+    matches = await retrieve_context(chat_request, nvidia)
+    return {"answer": format_answer(matches), "document_id": document_id, "indexing": indexing_status(job)}
+
+# Streaming ask endpoint: "status" events report indexing progress, followed by the streamed answer
+@app.post("/ask/stream")
+async def ask_stream(request: AskRequest, token: str = Depends(oauth2_scheme),
+                     nvidia: NvidiaClient = Depends(get_nvidia_client)):
+    document_id = pdf_link_to_document_id(request.pdf_link)
+    logger.info(f"Received streaming ask request for document: {document_id}")
+    job = await start_indexing(document_id, request.pdf_link, nvidia)
+
+    async def generate():
+        if job is not None:
+            while not await job_manager.wait(job, 1.0):
+                progress = f"{job.chunks_embedded}/{job.chunks_total} chunks" if job.chunks_total else "..."
+                yield sse_event("status", {"message": f"Indexing PDF ({job.stage}): {progress}",
+                                           "indexing": indexing_status(job)})
+            if job.status == "failed":
+                yield sse_event("error", {"detail": f"Failed to create embeddings for the PDF: {job.error}"})
+                return
+        yield sse_event("indexing", indexing_status(job))
+
+        chat_request = ChatRequest(user_input=request.question, document_id=document_id,
+                                   conversation_history=request.conversation_history, mode=request.mode)
+        async for event in answer_events(chat_request, nvidia):
+            yield event
 
-    except requests.RequestException as e:
-        logger.error(f"Error in chat endpoint: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"An error occurred while processing your request: {str(e)}")
\ No newline at end of file
+    return event_stream(generate())
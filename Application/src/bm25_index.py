@@ -0,0 +1,202 @@
+# src/bm25_index.py
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from urllib.parse import quote
+
+import numpy as np
+
+from src.query_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Words, optionally joined by "." or "-" so tickers, versions and form names like "10-K" stay whole
+_TOKEN_RE = re.compile(r"\w+(?:[.\-]\w+)*")
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just me more most my no nor not of off on once only or other
+our ours out over own same she should so some such than that the their theirs them then there these they
+this those through to too under until up very was we were what when where which while who whom why will
+with would you your yours
+""".split())
+
+
+def tokenize(text):
+    """Lowercased terms of a text, without stopwords"""
+    return [term for term in _TOKEN_RE.findall(normalize_query(text)) if term not in STOPWORDS]
+
+
+def identifier_terms(text):
+    """Tokens that look like identifiers rather than words: with digits, dotted or hyphenated, or uppercase tickers"""
+    return [
+        token for token in _TOKEN_RE.findall(text)
+        if any(char.isdigit() for char in token) or "." in token or "-" in token
+        or (len(token) > 1 and token.isalpha() and token.isupper())
+    ]
+
+
+def auto_retrieval_mode(text, covers, max_terms=4):
+    """Pick vector, lexical or hybrid search for a question.
+
+    Natural-language questions stay on vector search, even short ones. Questions
+    naming identifiers (codes, tickers, figures) go to BM25 alone when they have at
+    most max_terms terms and covers(terms) finds all of them in the document, and
+    to hybrid search otherwise.
+    """
+    if not identifier_terms(text):
+        return "vector"
+    terms = tokenize(text)
+    if len(terms) <= max_terms and covers(terms):
+        return "lexical"
+    return "hybrid"
+
+
+class _DocumentIndex:
+    def __init__(self, ids, texts, lengths, postings):
+        self.ids = ids
+        self.texts = texts
+        self.lengths = np.asarray(lengths, dtype=np.float32)
+        self.avg_length = float(self.lengths.mean()) if len(lengths) else 0.0
+        # term -> (chunk positions, term frequencies)
+        self.postings = {
+            term: (np.asarray(chunks, dtype=np.int32), np.asarray(freqs, dtype=np.float32))
+            for term, (chunks, freqs) in postings.items()
+        }
+
+
+class BM25Store:
+    """Per-document inverted indexes over chunk text, scored with BM25.
+
+    Each document is one JSON file holding its chunk ids and texts, chunk lengths
+    and a posting list per term. Recently searched documents stay in memory, so
+    a search touches only the postings of the query terms.
+    """
+
+    def __init__(self, root_dir, k1=1.2, b=0.75, max_open_documents=256):
+        self.root_dir = root_dir
+        self.k1 = k1
+        self.b = b
+        self.max_open_documents = max_open_documents
+        self._open = OrderedDict()  # document_id -> _DocumentIndex
+        self._lock = threading.Lock()
+        self._stats = {"builds": 0, "loads": 0, "searches": 0}
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _path(self, document_id):
+        return os.path.join(self.root_dir, quote(document_id, safe="") + ".json")
+
+    def build(self, document_id, ids, texts):
+        """Index a document's chunks, replacing any previous index of it"""
+        postings = {}
+        lengths = []
+        for position, text in enumerate(texts):
+            terms = tokenize(text)
+            lengths.append(len(terms))
+            for term, freq in Counter(terms).items():
+                chunks, freqs = postings.setdefault(term, ([], []))
+                chunks.append(position)
+                freqs.append(freq)
+
+        path = self._path(document_id)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ids": list(ids), "texts": list(texts), "lengths": lengths, "postings": postings},
+                      f, separators=(",", ":"))
+        with self._lock:
+            os.replace(path + ".tmp", path)
+            self._open.pop(document_id, None)
+            self._stats["builds"] += 1
+        logger.info(f"Built keyword index for {document_id}: {len(texts)} chunks, {len(postings)} terms")
+
+    def _load(self, document_id):
+        with self._lock:
+            index = self._open.get(document_id)
+            if index is not None:
+                self._open.move_to_end(document_id)
+                return index
+            try:
+                with open(self._path(document_id), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                return None
+            index = _DocumentIndex(data["ids"], data["texts"], data["lengths"], data["postings"])
+
+            self._stats["loads"] += 1
+            self._open[document_id] = index
+            while len(self._open) > self.max_open_documents:
+                self._open.popitem(last=False)
+            return index
+
+    def exists(self, document_id):
+        return document_id in self._open or os.path.exists(self._path(document_id))
+
+    def covers(self, document_id, terms):
+        """True if the document is indexed and every term occurs in it"""
+        index = self._load(document_id)
+        return index is not None and bool(terms) and all(term in index.postings for term in terms)
+
+    def search(self, document_id, query, top_k=3):
+        """Chunks matching the query terms, best first, in the vector backend's match format"""
+        index = self._load(document_id)
+        with self._lock:
+            self._stats["searches"] += 1
+        if index is None or not index.ids:
+            return []
+
+        count = len(index.ids)
+        scores = np.zeros(count, dtype=np.float32)
+        norms = self.k1 * (1 - self.b + self.b * index.lengths / (index.avg_length or 1.0))
+        for term in set(tokenize(query)):
+            posting = index.postings.get(term)
+            if posting is None:
+                continue
+            chunks, freqs = posting
+            idf = math.log(1 + (count - len(chunks) + 0.5) / (len(chunks) + 0.5))
+            scores[chunks] += idf * freqs * (self.k1 + 1) / (freqs + norms[chunks])
+
+        matched = np.flatnonzero(scores)
+        best = matched[np.argsort(-scores[matched], kind="stable")][:top_k]
+        return [
+            {"id": index.ids[i], "score": float(scores[i]),
+             "metadata": {"text": index.texts[i], "document_id": document_id}}
+            for i in best
+        ]
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "open_documents": len(self._open)}
+
+    def close(self):
+        with self._lock:
+            self._open.clear()
+
+
+def fuse_matches(vector_matches, keyword_matches, vector_weight=0.5, top_k=3):
+    """Combine vector and BM25 matches by min-max normalized score, weighted.
+
+    A chunk missing from one list scores zero there. Scores of the two retrievers
+    are on different scales, so each list is rescaled to [0, 1] before mixing.
+    """
+    def normalized(matches):
+        if not matches:
+            return {}
+        scores = [match["score"] for match in matches]
+        low, high = min(scores), max(scores)
+        return {match["id"]: (match["score"] - low) / (high - low) if high > low else 1.0 for match in matches}
+
+    vector_scores = normalized(vector_matches)
+    keyword_scores = normalized(keyword_matches)
+    by_id = {match["id"]: match for match in keyword_matches}
+    by_id.update({match["id"]: match for match in vector_matches})
+    fused = [
+        {**match, "score": vector_weight * vector_scores.get(chunk_id, 0.0)
+         + (1 - vector_weight) * keyword_scores.get(chunk_id, 0.0)}
+        for chunk_id, match in by_id.items()
+    ]
+    fused.sort(key=lambda match: match["score"], reverse=True)
+    return fused[:top_k]
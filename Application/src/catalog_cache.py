@@ -0,0 +1,156 @@
+# src/catalog_cache.py
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot:
+    """An immutable copy of the catalog rows together with their ETag"""
+
+    def __init__(self, rows, loaded_at):
+        self.rows = tuple(rows)
+        self.loaded_at = loaded_at
+        digest = hashlib.sha256(json.dumps(rows, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        self.version = digest[:16]
+        self._sorted_views = {}
+        self._lock = threading.Lock()
+
+    def sorted_view(self, sort, require=None):
+        """Rows in ascending sort order with their sort keys, computed once per snapshot.
+
+        With require, only rows with a non-empty value in that field are kept.
+        """
+        with self._lock:
+            view = self._sorted_views.get((sort, require))
+            if view is None:
+                field = SORT_FIELDS[sort]
+                rows = [row for row in self.rows if row.get(require)] if require else self.rows
+                keyed = sorted(((_sort_key(row, field), row) for row in rows), key=lambda pair: pair[0])
+                view = ([key for key, _ in keyed], [row for _, row in keyed])
+                self._sorted_views[(sort, require)] = view
+            return view
+
+
+class CatalogCache:
+    """In-process TTL cache in front of the CFA_NEW catalog query.
+
+    Only one thread reloads an expired catalog; the others wait for its result
+    instead of issuing the same query.
+    """
+
+    def __init__(self, loader, ttl=900.0):
+        self._loader = loader
+        self.ttl = ttl
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at < self.ttl:
+            self._stats["hits"] += 1
+            return snapshot
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - snapshot.loaded_at < self.ttl:
+                self._stats["hits"] += 1
+                return snapshot
+            self._stats["misses"] += 1
+            snapshot = CatalogSnapshot(self._loader(), time.monotonic())
+            self._snapshot = snapshot
+            logger.info(f"Loaded catalog with {len(snapshot.rows)} rows (version {snapshot.version})")
+            return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._stats["invalidations"] += 1
+        logger.info("Catalog cache invalidated")
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            **self._stats,
+            "ttl": self.ttl,
+            "rows": len(snapshot.rows) if snapshot else 0,
+            "version": snapshot.version if snapshot else None,
+            "age_seconds": round(time.monotonic() - snapshot.loaded_at, 1) if snapshot else None,
+        }
+
+
+SORT_FIELDS = {"title": "Title", "date": "Date"}
+
+
+class InvalidCursor(ValueError):
+    """Raised when an `after` cursor cannot be decoded or belongs to a different sort"""
+
+
+def _sort_key(row, field):
+    # Rows without a value sort first; the title, then the PDF link break ties. Titles
+    # repeat, but each row has its own PDF, so the link keeps keys unique and a cursor
+    # never skips rows that share a title with the last row of a page
+    value = row.get(field) or ""
+    title = row.get("Title") or ""
+    return [str(value).lower(), title.lower(), title, str(row.get("PDF_Link") or "")]
+
+
+def encode_cursor(sort, descending, key):
+    raw = json.dumps({"s": sort, "d": descending, "k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort, descending):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        key = data["k"]
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor("Malformed pagination cursor")
+    if not isinstance(key, list) or not all(isinstance(part, str) for part in key):
+        raise InvalidCursor("Malformed pagination cursor")
+    if data.get("s") != sort or data.get("d") != descending:
+        raise InvalidCursor("Pagination cursor was issued for a different sort order")
+    return key
+
+
+def paginate(snapshot, sort="title", descending=False, after=None, limit=None, require=None):
+    """Return one keyset page of the catalog and the cursor for the next page (None on the last page).
+
+    require skips rows with an empty value in that field before the page is cut,
+    so pages stay full.
+    """
+    keys, rows = snapshot.sorted_view(sort, require)
+    after_key = decode_cursor(after, sort, descending) if after else None
+
+    if not descending:
+        start = bisect_right(keys, after_key) if after_key is not None else 0
+        end = min(start + limit, len(rows)) if limit else len(rows)
+        page, has_more, last = rows[start:end], end < len(rows), end - 1
+    else:
+        end = bisect_left(keys, after_key) if after_key is not None else len(rows)
+        start = max(end - limit, 0) if limit else 0
+        page, has_more, last = rows[start:end][::-1], start > 0, start
+
+    next_cursor = encode_cursor(sort, descending, keys[last]) if page and has_more else None
+    return page, next_cursor
+
+
+def make_etag(*parts):
+    return '"' + hashlib.sha256("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match header value against an ETag, ignoring weak validators"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
@@ -0,0 +1,115 @@
+# src/chunking.py
+import logging
+import math
+import re
+from collections import deque
+
+from nltk.tokenize import sent_tokenize
+
+logger = logging.getLogger(__name__)
+
+# nv-embedqa-e5-v5 accepts 512 tokens, including [CLS]/[SEP] and the "passage: "
+# or "query: " prefix the endpoint adds; chunk budgets stay at least the margin below
+EMBEDDING_TOKEN_LIMIT = 512
+EMBEDDING_TOKEN_MARGIN = 16
+DEFAULT_MAX_TOKENS = 480
+# The model is fine-tuned from e5-large-unsupervised and shares its WordPiece vocabulary
+DEFAULT_TOKENIZER = "intfloat/e5-large-unsupervised"
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def approximate_token_count(text):
+    """Estimate WordPiece tokens: one per word or punctuation mark plus a margin for split words.
+
+    Words with digits are counted as one token per two characters, since long
+    numbers are split into several pieces.
+    """
+    tokens = 0.0
+    for word in _TOKEN_PATTERN.findall(text):
+        tokens += math.ceil(len(word) / 2) if any(char.isdigit() for char in word) else 1.3
+    return math.ceil(tokens)
+
+
+def load_token_counter(tokenizer_name=DEFAULT_TOKENIZER):
+    """Token counter backed by a Hugging Face tokenizer if it can be loaded, else the approximate counter"""
+    if not tokenizer_name:
+        return approximate_token_count
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer {tokenizer_name}, using approximate token counts: {str(e)}")
+        return approximate_token_count
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False, verbose=False))
+
+
+def embedding_chunk_budget(max_tokens):
+    """Clamp a chunk budget so chunks fit the embedding model with EMBEDDING_TOKEN_MARGIN to spare"""
+    limit = EMBEDDING_TOKEN_LIMIT - EMBEDDING_TOKEN_MARGIN
+    if max_tokens > limit:
+        logger.warning(f"Chunk budget of {max_tokens} tokens exceeds the embedding model's limit; using {limit}")
+        return limit
+    return max_tokens
+
+
+def _split_long_sentence(sentence, max_tokens, count_tokens):
+    # Break a sentence that alone exceeds the budget at word boundaries
+    piece, piece_tokens = [], 0
+    for word in sentence.split():
+        word_tokens = count_tokens(word)
+        if piece and piece_tokens + word_tokens > max_tokens:
+            yield " ".join(piece)
+            piece, piece_tokens = [], 0
+        piece.append(word)
+        piece_tokens += word_tokens
+    if piece:
+        yield " ".join(piece)
+
+
+def iter_chunks(text, max_tokens=DEFAULT_MAX_TOKENS, overlap=64, overlap_unit="tokens", count_tokens=None):
+    """Yield sentence-aligned chunks of at most max_tokens tokens in one linear pass.
+
+    Consecutive chunks share up to `overlap` tokens (or characters, with
+    overlap_unit="chars") of trailing sentences. Every sentence is counted once
+    and enters and leaves the window once, with running token and character totals.
+    """
+    if overlap_unit not in ("tokens", "chars"):
+        raise ValueError("overlap_unit must be 'tokens' or 'chars'")
+    if overlap_unit == "tokens" and overlap >= max_tokens:
+        raise ValueError("overlap must be smaller than max_tokens")
+    count_tokens = count_tokens or approximate_token_count
+
+    window = deque()  # (sentence, tokens, chars)
+    window_tokens = 0
+    window_chars = 0
+    emitted_through = 0  # sentences at the front of the window that are already in a chunk
+
+    def overlap_size():
+        return window_tokens if overlap_unit == "tokens" else window_chars
+
+    for sentence in sent_tokenize(text):
+        tokens = count_tokens(sentence)
+        pieces = [(sentence, tokens)] if tokens <= max_tokens else \
+            [(piece, count_tokens(piece)) for piece in _split_long_sentence(sentence, max_tokens, count_tokens)]
+
+        for piece, piece_tokens in pieces:
+            if piece_tokens > max_tokens:
+                # A single word longer than the budget cannot be split at word boundaries
+                logger.warning(f"Chunk piece of {piece_tokens} tokens exceeds the budget of {max_tokens}")
+            if window and window_tokens + piece_tokens > max_tokens:
+                if emitted_through < len(window):
+                    yield " ".join(item[0] for item in window)
+                # Keep only the trailing sentences that fit the overlap and leave room for this piece
+                while window and (overlap_size() > overlap or window_tokens + piece_tokens > max_tokens):
+                    _, dropped_tokens, dropped_chars = window.popleft()
+                    window_tokens -= dropped_tokens
+                    window_chars -= dropped_chars
+                emitted_through = len(window)
+
+            window.append((piece, piece_tokens, len(piece)))
+            window_tokens += piece_tokens
+            window_chars += len(piece)
+
+    if window and emitted_through < len(window):
+        yield " ".join(item[0] for item in window)
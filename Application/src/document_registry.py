@@ -0,0 +1,97 @@
+# src/document_registry.py
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INDEXING = "indexing"
+INDEXED = "indexed"
+FAILED = "failed"
+
+_COLUMNS = ("document_id", "pdf_link", "status", "chunk_count", "model", "content_hash", "error", "updated_at")
+
+
+class DocumentRegistry:
+    """Record of which documents are embedded, kept in SQLite and mirrored in memory.
+
+    Only documents indexed with the current embedding model count as indexed, so
+    switching models re-indexes documents on their next /embed request.
+    """
+
+    def __init__(self, path, model):
+        self.path = path
+        self.model = model
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "document_id TEXT PRIMARY KEY, pdf_link TEXT, status TEXT NOT NULL, chunk_count INTEGER, "
+            "model TEXT, content_hash TEXT, error TEXT, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._indexed = {
+            row[0] for row in self._db.execute(
+                "SELECT document_id FROM documents WHERE status = ? AND model = ?", (INDEXED, model)
+            )
+        }
+        logger.info(f"Document registry has {len(self._indexed)} indexed documents")
+
+    def is_indexed(self, document_id):
+        # Answered from memory, no database or vector store round trip
+        return document_id in self._indexed
+
+    def refresh(self, document_id):
+        """Re-read a document's status from the database, which other worker processes may have updated"""
+        record = self.get(document_id)
+        indexed = record is not None and record["status"] == INDEXED and record["model"] == self.model
+        with self._lock:
+            if indexed:
+                self._indexed.add(document_id)
+            else:
+                self._indexed.discard(document_id)
+        return indexed
+
+    def get(self, document_id):
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM documents WHERE document_id = ?", (document_id,)
+            ).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def mark_indexing(self, document_id, pdf_link):
+        self._write(document_id, pdf_link=pdf_link, status=INDEXING, model=self.model, error=None)
+
+    def mark_indexed(self, document_id, chunk_count, content_hash=None, pdf_link=None):
+        self._write(document_id, pdf_link=pdf_link, status=INDEXED, chunk_count=chunk_count,
+                    model=self.model, content_hash=content_hash, error=None)
+
+    def mark_failed(self, document_id, error):
+        self._write(document_id, status=FAILED, error=error)
+
+    def _write(self, document_id, **fields):
+        fields = {key: value for key, value in fields.items() if value is not None or key == "error"}
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{key} = excluded.{key}" for key in fields)
+        columns = ["document_id", *fields]
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO documents ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT (document_id) DO UPDATE SET {assignments}",
+                (document_id, *fields.values())
+            )
+            self._db.commit()
+            if fields["status"] == INDEXED:
+                self._indexed.add(document_id)
+            else:
+                self._indexed.discard(document_id)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM documents GROUP BY status").fetchall())
+        return {"indexed_in_memory": len(self._indexed), **counts}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
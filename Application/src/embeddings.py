@@ -0,0 +1,70 @@
+# src/embeddings.py
+import asyncio
+import logging
+
+from src.nvidia_client import NvidiaAPIError
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "nvidia/nv-embedqa-e5-v5"
+
+
+class EmbeddingError(Exception):
+    """Raised when the embeddings endpoint returns an unusable response for a batch"""
+
+    def __init__(self, message, start=None):
+        super().__init__(message)
+        self.start = start
+
+
+def iter_batches(items, batch_size):
+    """Yield (start_offset, batch) pairs over a list"""
+    for start in range(0, len(items), batch_size):
+        yield start, items[start:start + batch_size]
+
+
+async def embed_texts(client, texts, api_key, batch_size=32, max_concurrency=4, input_type="query",
+                      model=EMBEDDING_MODEL, progress=None, truncate="NONE"):
+    """Embed texts in batches with a bounded number of in-flight requests, preserving input order.
+
+    progress, if given, is called with the number of texts embedded so far after each batch.
+    Texts are not truncated by default: one over the model's limit fails its batch
+    instead of being embedded in part.
+    """
+    if not texts:
+        return []
+
+    batches = list(iter_batches(texts, batch_size))
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    vectors = [None] * len(texts)
+    completed = 0
+
+    async def embed_batch(start, batch):
+        nonlocal completed
+        async with semaphore:
+            try:
+                batch_vectors = await client.embed(batch, api_key, model, input_type, truncate=truncate)
+            except (NvidiaAPIError, KeyError) as e:
+                raise EmbeddingError(f"Embedding request failed for chunks starting at {start}: {str(e)}", start) from e
+        if any(not vector for vector in batch_vectors):
+            raise EmbeddingError(f"Embedding response is missing vectors for chunks starting at {start}", start)
+        vectors[start:start + len(batch_vectors)] = batch_vectors
+        completed += len(batch_vectors)
+        if progress:
+            progress(completed)
+        logger.info(f"Embedded chunks {start}-{start + len(batch_vectors) - 1}")
+
+    # On the first failure the remaining batches are cancelled, so a failed request stops using API quota
+    tasks = [asyncio.ensure_future(embed_batch(start, batch)) for start, batch in batches]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in done:
+        if task.exception() is not None:
+            raise task.exception()
+
+    logger.info(f"Generated {len(vectors)} embeddings in {len(batches)} batches")
+    return vectors
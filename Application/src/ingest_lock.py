@@ -0,0 +1,56 @@
+# src/ingest_lock.py
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentLock:
+    """Exclusive per-document lock shared by every worker process on the host.
+
+    Each document gets a lock file in lock_dir held with flock. Without a
+    lock_dir (or on platforms without flock) hold() does not lock at all.
+    """
+
+    def __init__(self, lock_dir=None, poll_interval=0.5):
+        if lock_dir and fcntl is None:
+            logger.warning("File locks are not supported on this platform, ingestion will not be locked across processes")
+            lock_dir = None
+        self.lock_dir = lock_dir
+        self.poll_interval = poll_interval
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    @asynccontextmanager
+    async def hold(self, document_id):
+        if not self.lock_dir:
+            yield
+            return
+
+        fd = os.open(os.path.join(self.lock_dir, f"{quote(document_id, safe='')}.lock"), os.O_CREAT | os.O_RDWR)
+        try:
+            waited = False
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if not waited:
+                        logger.info(f"Waiting for another process to finish ingesting document: {document_id}")
+                        waited = True
+                    # Poll instead of blocking so waiting never ties up a thread
+                    await asyncio.sleep(self.poll_interval)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
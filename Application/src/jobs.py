@@ -0,0 +1,184 @@
+# src/jobs.py
+import asyncio
+import functools
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionError(Exception):
+    """Raised by an ingestion stage when a document cannot be indexed"""
+
+
+class IngestionJob:
+    """Progress and timings of one document ingestion"""
+
+    def __init__(self, document_id, pdf_link):
+        self.job_id = uuid.uuid4().hex
+        self.document_id = document_id
+        self.pdf_link = pdf_link
+        self.status = "queued"
+        self.stage = "queued"
+        self.pages_extracted = 0
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+        self.chunks_upserted = 0
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.timings = {}
+        self._stage_started = None
+        self._lock = threading.Lock()
+
+    def set_stage(self, stage):
+        """Close the timing of the current stage and start the next one"""
+        now = time.time()
+        with self._lock:
+            if self._stage_started is not None:
+                self.timings[self.stage] = round(now - self._stage_started, 3)
+            self.stage = stage
+            self._stage_started = now
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def finish(self, status):
+        """Mark the job completed or failed; a failed job keeps the stage it failed in"""
+        now = time.time()
+        with self._lock:
+            if self._stage_started is not None:
+                self.timings[self.stage] = round(now - self._stage_started, 3)
+            self._stage_started = None
+            if status == "completed":
+                self.stage = "done"
+            self.status = status
+            self.finished_at = now
+
+    @property
+    def done(self):
+        return self.status in ("completed", "failed")
+
+    def to_dict(self):
+        with self._lock:
+            elapsed_end = self.finished_at or time.time()
+            return {
+                "job_id": self.job_id,
+                "document_id": self.document_id,
+                "pdf_link": self.pdf_link,
+                "status": self.status,
+                "stage": self.stage,
+                "pages_extracted": self.pages_extracted,
+                "chunks_total": self.chunks_total,
+                "chunks_embedded": self.chunks_embedded,
+                "chunks_upserted": self.chunks_upserted,
+                "error": self.error,
+                "result": self.result,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "queued_seconds": round((self.started_at or elapsed_end) - self.created_at, 3),
+                "elapsed_seconds": round(elapsed_end - self.started_at, 3) if self.started_at else None,
+                "timings": dict(self.timings),
+            }
+
+
+class JobManager:
+    """Runs ingestion pipelines with bounded concurrency and keeps their status.
+
+    Pipelines are coroutines driven on the event loop; their blocking stages go
+    through run_blocking, which hands them to the manager's worker threads.
+    Submitting a document that already has an unfinished job returns that job,
+    so concurrent requests for one document share a single ingestion.
+    """
+
+    def __init__(self, max_workers=2, history_size=200):
+        self.max_workers = max_workers
+        self.history_size = history_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._slots = None
+        self._running = {}  # job_id -> task
+        self._active = {}  # document_id -> unfinished job
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, document_id, pdf_link, pipeline):
+        """Schedule pipeline(job) for a document and return the job right away"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        with self._lock:
+            active = self._active.get(document_id)
+            if active is not None:
+                logger.info(f"Joining ingestion job {active.job_id} already running for document: {document_id}")
+                return active
+            job = IngestionJob(document_id, pdf_link)
+            self._jobs[job.job_id] = job
+            self._active[document_id] = job
+            self._prune()
+        task = asyncio.get_running_loop().create_task(self._run(job, pipeline))
+        self._running[job.job_id] = task
+        task.add_done_callback(lambda _, job=job: self._forget(job))
+        logger.info(f"Queued ingestion job {job.job_id} for document: {document_id}")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    async def wait(self, job, timeout=None):
+        """Wait up to timeout seconds for a job to finish and return whether it has"""
+        task = self._running.get(job.job_id)
+        if task is not None:
+            await asyncio.wait({task}, timeout=timeout)
+        return job.done
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """Run a blocking stage on the ingestion worker threads"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def shutdown(self):
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, job, pipeline):
+        async with self._slots:
+            job.update(status="running", started_at=time.time())
+            try:
+                job.update(result=await pipeline(job))
+                job.finish("completed")
+                logger.info(f"Ingestion job {job.job_id} completed in {job.finished_at - job.started_at:.2f}s")
+            except asyncio.CancelledError:
+                job.update(error="Ingestion cancelled during shutdown")
+                job.finish("failed")
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion job {job.job_id} failed during {job.stage}: {str(e)}")
+                job.update(error=str(e))
+                job.finish("failed")
+
+    def _forget(self, job):
+        self._running.pop(job.job_id, None)
+        with self._lock:
+            if self._active.get(job.document_id) is job:
+                del self._active[job.document_id]
+
+    def _prune(self):
+        # Drop the oldest finished jobs once the history is full
+        if len(self._jobs) <= self.history_size:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done]:
+            if len(self._jobs) <= self.history_size:
+                break
+            del self._jobs[job_id]
@@ -0,0 +1,153 @@
+# src/nvidia_client.py
+import asyncio
+import json
+import logging
+import random
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+NVIDIA_API_BASE_URL = "https://integrate.api.nvidia.com/v1"
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class NvidiaAPIError(Exception):
+    """Raised when an NVIDIA API call fails after all retries"""
+
+    def __init__(self, message, status_code=None, body=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class NvidiaClient:
+    """Application-scoped async client for the NVIDIA API with pooled keep-alive connections and retries"""
+
+    def __init__(self, max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0,
+                 timeout=60.0, connect_timeout=10.0, retries=3, backoff=0.5, max_backoff=8.0,
+                 base_url=NVIDIA_API_BASE_URL):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            headers={"Content-Type": "application/json"}
+        )
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def _retry_delay(self, attempt, response=None):
+        # Honour Retry-After on throttling, otherwise exponential backoff with jitter
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        delay = min(self.backoff * (2 ** attempt), self.max_backoff)
+        return delay + random.uniform(0, delay / 2)
+
+    async def post(self, path, payload, api_key):
+        """POST a JSON payload and return the decoded JSON response, retrying transient failures"""
+        headers = {"Authorization": f"Bearer {api_key}"}
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                response = await self._client.post(path, json=payload, headers=headers)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                error = f"NVIDIA API returned {response.status_code} for {path}"
+            except httpx.HTTPStatusError as e:
+                raise NvidiaAPIError(f"NVIDIA API request failed: {str(e)}", e.response.status_code, e.response.text)
+            except httpx.TransportError as e:
+                error = f"NVIDIA API request to {path} failed: {str(e)}"
+            except ValueError as e:
+                raise NvidiaAPIError(f"Invalid JSON response from NVIDIA API: {str(e)}", response.status_code, response.text)
+
+            if attempt == self.retries:
+                raise NvidiaAPIError(
+                    error,
+                    response.status_code if response is not None else None,
+                    response.text if response is not None else None
+                )
+            delay = self._retry_delay(attempt, response)
+            logger.warning(f"{error}; retrying in {delay:.2f}s (attempt {attempt + 1}/{self.retries})")
+            await asyncio.sleep(delay)
+
+    async def embed(self, texts, api_key, model, input_type="query", truncate="END"):
+        """Embed a list of texts in one request and return the vectors in input order.
+
+        Inputs over the model's token limit are truncated rather than rejected.
+        """
+        payload = {
+            "model": model,
+            "input": texts,
+            "encoding_format": "float",
+            "input_type": input_type,
+            "truncate": truncate
+        }
+        data = (await self.post("/embeddings", payload, api_key))["data"]
+
+        # The endpoint tags each item with its position in the input list
+        vectors = [None] * len(texts)
+        for position, item in enumerate(data):
+            vectors[item.get("index", position)] = item["embedding"]
+        return vectors
+
+    async def chat_completion(self, payload, api_key):
+        return await self.post("/chat/completions", payload, api_key)
+
+    async def stream_chat_completion(self, payload, api_key):
+        """Yield completion text deltas as the API streams them.
+
+        Failures are retried only until the first byte arrives; after that a
+        dropped stream raises NvidiaAPIError.
+        """
+        headers = {"Authorization": f"Bearer {api_key}", "Accept": "text/event-stream"}
+        payload = {**payload, "stream": True}
+        started = False
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._client.stream("POST", "/chat/completions", json=payload, headers=headers) as response:
+                    if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.retries:
+                        error = f"NVIDIA API returned {response.status_code} for /chat/completions"
+                        delay = self._retry_delay(attempt, response)
+                    elif response.status_code >= 400:
+                        body = (await response.aread()).decode("utf-8", "replace")
+                        raise NvidiaAPIError(f"NVIDIA API returned {response.status_code} for /chat/completions",
+                                             response.status_code, body)
+                    else:
+                        async for delta in self._iter_deltas(response):
+                            started = True
+                            yield delta
+                        return
+            except httpx.TransportError as e:
+                if started or attempt == self.retries:
+                    raise NvidiaAPIError(f"NVIDIA API stream failed: {str(e)}")
+                error = f"NVIDIA API stream failed: {str(e)}"
+                delay = self._retry_delay(attempt)
+            logger.warning(f"{error}; retrying in {delay:.2f}s (attempt {attempt + 1}/{self.retries})")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _iter_deltas(response):
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            try:
+                chunk = json.loads(data)
+            except ValueError as e:
+                raise NvidiaAPIError(f"Invalid event in NVIDIA API stream: {str(e)}", response.status_code, data)
+            delta = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
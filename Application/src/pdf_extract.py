@@ -0,0 +1,100 @@
+# src/pdf_extract.py
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+def _extract_range(path, start, stop):
+    # Tasks carry the path of the spooled PDF, not its bytes. The reader is local to the
+    # task, so an idle worker holds no copy of the document once its range is done; each
+    # task covers several pages to spread the cost of parsing the file again.
+    with open(path, "rb") as f:
+        reader = PdfReader(io.BytesIO(f.read()))
+    return start, [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+class PdfTextExtractor:
+    """Extracts PDF text page by page, spreading large documents across a process pool.
+
+    Documents with fewer than min_pages_for_pool pages are extracted in-process,
+    where the cost of handing the document to workers would outweigh the gain.
+    Larger ones are written once to a temporary file that the workers read, so
+    tasks carry only a page range instead of a copy of the whole PDF.
+    """
+
+    def __init__(self, max_workers=None, min_pages_for_pool=24, pages_per_task=16, mp_context="spawn"):
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.min_pages_for_pool = min_pages_for_pool
+        self.pages_per_task = pages_per_task
+        self.mp_context = mp_context
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Started on first use so short-lived processes never pay for worker startup
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(self.mp_context)
+                )
+            return self._pool
+
+    def iter_pages(self, pdf_content):
+        """Yield (page_number, text) in page order, each page as soon as it and all earlier pages are done"""
+        reader = PdfReader(io.BytesIO(pdf_content))
+        page_count = len(reader.pages)
+
+        if page_count < self.min_pages_for_pool or self.max_workers == 1:
+            for i, page in enumerate(reader.pages):
+                yield i, page.extract_text() or ""
+            return
+
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_content)
+        # Keep every worker busy even when the document is only a few tasks long
+        task_size = max(1, min(self.pages_per_task, -(-page_count // self.max_workers)))
+        futures = []
+        finished = {}
+        next_page = 0
+        try:
+            pool = self._get_pool()
+            futures = [
+                pool.submit(_extract_range, path, start, min(start + task_size, page_count))
+                for start in range(0, page_count, task_size)
+            ]
+            for future in as_completed(futures):
+                start, texts = future.result()
+                finished[start] = texts
+                while next_page in finished:
+                    texts = finished.pop(next_page)
+                    for offset, text in enumerate(texts):
+                        yield next_page + offset, text
+                    next_page += len(texts)
+        finally:
+            for future in futures:
+                future.cancel()
+            os.remove(path)
+
+    def extract_pages(self, pdf_content, progress=None):
+        """Return the text of every page in order; progress, if given, receives the pages done so far"""
+        pages = []
+        for _, text in self.iter_pages(pdf_content):
+            pages.append(text)
+            if progress:
+                progress(len(pages))
+        return pages
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
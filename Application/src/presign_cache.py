@@ -0,0 +1,56 @@
+# src/presign_cache.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class PresignedUrlCache:
+    """Reuses presigned S3 GET URLs until safety_margin seconds before they expire"""
+
+    def __init__(self, s3_client, expires_in=3600, safety_margin=600, max_entries=5000):
+        if safety_margin >= expires_in:
+            raise ValueError("safety_margin must be shorter than expires_in")
+        self._s3 = s3_client
+        self.expires_in = expires_in
+        self.safety_margin = safety_margin
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (bucket, key) -> (url, reuse_until)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, bucket, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((bucket, key))
+            if entry is not None and now < entry[1]:
+                self._entries.move_to_end((bucket, key))
+                self._stats["hits"] += 1
+                return entry[0]
+            self._stats["misses"] += 1
+
+        url = self._s3.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": bucket, "Key": key},
+            ExpiresIn=self.expires_in
+        )
+        with self._lock:
+            self._entries[(bucket, key)] = (url, now + self.expires_in - self.safety_margin)
+            self._entries.move_to_end((bucket, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return url
+
+    def resolve(self, link):
+        """Presign s3:// links through the cache and pass any other link through unchanged"""
+        if not link.startswith('s3://'):
+            return link
+        bucket, key = link[5:].split('/', 1)
+        return self.get(bucket, key)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "max_entries": self.max_entries}
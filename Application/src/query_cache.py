@@ -0,0 +1,122 @@
+# src/query_cache.py
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text):
+    # The e5 embedding model is uncased, so case and spacing differences do not change the vector
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache from (model, normalized query) to its embedding vector.
+
+    Vectors are held as float32 arrays. With persist_path set, entries are also
+    written to SQLite and the most recently used ones are reloaded on startup.
+    """
+
+    def __init__(self, max_entries=2048, persist_path=None):
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self._entries = OrderedDict()  # key -> array('f')
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._db = None
+        if persist_path:
+            self._open_db()
+
+    @staticmethod
+    def _key(text, model):
+        return f"{model}\x00{normalize_query(text)}"
+
+    def get(self, text, model):
+        key = self._key(text, model)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return vector.tolist()
+
+    def put(self, text, model, vector):
+        key = self._key(text, model)
+        packed = array("f", vector)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= self._entry_size(key, previous)
+            self._entries[key] = packed
+            self._bytes += self._entry_size(key, packed)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                old_key, old_vector = self._entries.popitem(last=False)
+                self._bytes -= self._entry_size(old_key, old_vector)
+                self._stats["evictions"] += 1
+                evicted.append(old_key)
+            if self._db is not None:
+                self._persist(key, packed, evicted)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else None,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "memory_bytes": self._bytes,
+                "persistent": self._db is not None,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    @staticmethod
+    def _entry_size(key, vector):
+        return len(key.encode("utf-8")) + vector.itemsize * len(vector)
+
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.persist_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            rows = self._db.execute(
+                "SELECT key, vector FROM query_embeddings ORDER BY last_used DESC LIMIT ?", (self.max_entries,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Query embedding cache persistence disabled: {str(e)}")
+            self._db = None
+            return
+        # Oldest first, so the most recently used entries end up at the LRU tail
+        for key, blob in reversed(rows):
+            vector = array("f")
+            vector.frombytes(blob)
+            self._entries[key] = vector
+            self._bytes += self._entry_size(key, vector)
+        logger.info(f"Loaded {len(rows)} query embeddings from {self.persist_path}")
+
+    def _persist(self, key, vector, evicted):
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                (key, vector.tobytes(), time.time())
+            )
+            self._db.executemany("DELETE FROM query_embeddings WHERE key = ?", [(old,) for old in evicted])
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not persist query embedding: {str(e)}")
@@ -0,0 +1,98 @@
+# src/services.py
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class LazyService:
+    """A service built by its factory on first use, then shared.
+
+    Attribute access is forwarded to the built instance, so a LazyService can
+    stand in for the object it wraps. A failed build is retried on the next use.
+    """
+
+    def __init__(self, name, factory, close=None):
+        self.name = name
+        self._factory = factory
+        self._close = close
+        self._instance = None
+        self._ready = False
+        self._error = None
+        self._init_seconds = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._ready
+
+    def get(self):
+        if self._ready:
+            return self._instance
+        with self._lock:
+            if not self._ready:
+                started = time.perf_counter()
+                try:
+                    self._instance = self._factory()
+                except Exception as e:
+                    self._error = str(e)
+                    logger.error(f"Failed to initialize {self.name}: {str(e)}")
+                    raise
+                self._init_seconds = round(time.perf_counter() - started, 3)
+                self._error = None
+                self._ready = True
+                logger.info(f"Initialized {self.name} in {self._init_seconds:.3f}s")
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def status(self):
+        return {"ready": self._ready, "init_seconds": self._init_seconds, "error": self._error}
+
+    def close(self):
+        with self._lock:
+            if self._ready and self._close is not None:
+                self._close(self._instance)
+            self._instance = None
+            self._ready = False
+
+
+class ServiceContainer:
+    """Registry of lazily initialized services that can be warmed in the background"""
+
+    def __init__(self):
+        self._services = OrderedDict()
+
+    def register(self, name, factory, close=None):
+        service = LazyService(name, factory, close)
+        self._services[name] = service
+        return service
+
+    async def warm(self):
+        """Initialize every service on worker threads; failures are logged and retried on first use"""
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(None, service.get) for service in self._services.values()),
+            return_exceptions=True
+        )
+        failed = [name for name, result in zip(self._services, results) if isinstance(result, Exception)]
+        if failed:
+            logger.warning(f"Services not ready after warm-up: {', '.join(failed)}")
+
+    @property
+    def ready(self):
+        return all(service.ready for service in self._services.values())
+
+    def status(self):
+        return {name: service.status() for name, service in self._services.items()}
+
+    def close(self):
+        for service in reversed(self._services.values()):
+            try:
+                service.close()
+            except Exception as e:
+                logger.error(f"Error closing {service.name}: {str(e)}")
@@ -0,0 +1,178 @@
+# src/snowflake_pool.py
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class SnowflakePool:
+    """Bounded, thread-safe pool of Snowflake connections.
+
+    Idle connections are health-checked before reuse once they have been idle
+    for health_check_after seconds, and closed once idle for max_idle seconds.
+    """
+
+    def __init__(self, connect, max_size=5, max_idle=300.0, health_check_after=30.0, acquire_timeout=10.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+        self._idle = []  # (connection, released_at), most recently released last
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "created": 0,
+            "closed": 0,
+            "acquired": 0,
+            "reused": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "evicted_idle": 0,
+        }
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it is discarded instead of returned if the block raises a connector error"""
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except Exception as e:
+            discard = self._is_connection_error(e)
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def acquire(self, timeout=None):
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        evicted = []
+        error = None
+        conn = released_at = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    error = PoolTimeout("Snowflake pool is closed")
+                    break
+                evicted.extend(self._evict_idle_locked())
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.max_size:
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    error = PoolTimeout(f"No Snowflake connection available within {timeout}s")
+                    break
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                wait_started = time.monotonic()
+                self._cond.wait(remaining)
+                self._stats["wait_seconds"] += time.monotonic() - wait_started
+
+        # Close, connect and health-check outside the lock; the slot is already reserved
+        for stale in evicted:
+            self._close(stale)
+        if error is not None:
+            raise error
+        try:
+            if conn is not None and time.monotonic() - released_at > self.health_check_after and not self._is_healthy(conn):
+                self._close(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+                with self._cond:
+                    self._stats["created"] += 1
+            else:
+                with self._cond:
+                    self._stats["reused"] += 1
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._stats["acquired"] += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        if discard or self._closed:
+            self._close(conn)
+        with self._cond:
+            self._in_use -= 1
+            if not discard and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def metrics(self):
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                **{name: round(value, 3) if isinstance(value, float) else value for name, value in self._stats.items()},
+            }
+
+    def _is_healthy(self, conn):
+        try:
+            if conn.is_closed():
+                raise ConnectionError("connection is closed")
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding unhealthy Snowflake connection: {str(e)}")
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+            return False
+
+    def _evict_idle_locked(self):
+        # Oldest idle connections sit at the front of the list
+        now = time.monotonic()
+        evicted = []
+        while self._idle and now - self._idle[0][1] > self.max_idle:
+            evicted.append(self._idle.pop(0)[0])
+            self._stats["evicted_idle"] += 1
+        return evicted
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Error closing Snowflake connection: {str(e)}")
+        with self._cond:
+            self._stats["closed"] += 1
+
+    @staticmethod
+    def _is_connection_error(error):
+        # Only connector-level failures poison a connection; SQL and application errors do not
+        return type(error).__module__.startswith("snowflake.connector") and \
+            type(error).__name__ in ("OperationalError", "InterfaceError", "DatabaseError")
@@ -0,0 +1,162 @@
+# src/summarize.py
+import asyncio
+import logging
+
+from src.chunking import iter_chunks, approximate_token_count
+from src.nvidia_client import NvidiaAPIError
+
+logger = logging.getLogger(__name__)
+
+MAP_PROMPT_TEMPLATE = (
+    "Summarize the following section of a longer document. Keep the key facts, figures and conclusions.\n\n{text}"
+)
+REDUCE_PROMPT_TEMPLATE = (
+    "The following are summaries of consecutive sections of one document. "
+    "Combine them into a single concise summary of the whole document.\n\n{text}"
+)
+
+
+class SummarizationError(Exception):
+    """Raised when a section or reduce step cannot be summarized"""
+
+
+def split_sections(text, max_tokens, count_tokens=None):
+    """Split document text into sentence-aligned sections of at most max_tokens tokens"""
+    return list(iter_chunks(text, max_tokens=max_tokens, overlap=0, count_tokens=count_tokens))
+
+
+def group_summaries(summaries, max_tokens, fanout, count_tokens=None):
+    """Group consecutive summaries so that each group fits max_tokens and holds at most fanout items.
+
+    Every group except possibly a lone leftover holds at least two summaries, so
+    each reduce level shrinks the list.
+    """
+    count_tokens = count_tokens or approximate_token_count
+    groups, group, group_tokens = [], [], 0
+    for summary in summaries:
+        tokens = count_tokens(summary)
+        if len(group) >= 2 and (group_tokens + tokens > max_tokens or len(group) >= fanout):
+            groups.append(group)
+            group, group_tokens = [], 0
+        group.append(summary)
+        group_tokens += tokens
+    if group:
+        groups.append(group)
+    return groups
+
+
+async def _gather_or_cancel(coros):
+    """Run the coroutines concurrently and return their results in order.
+
+    Unlike asyncio.gather, the first failure cancels the calls still in flight instead of leaving them running.
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in done:
+        if task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
+
+
+class _MapReduce:
+    """Shared state of one map-reduce run: the completion settings, the concurrency bound and call counts"""
+
+    def __init__(self, client, api_key, model, params, max_concurrency, reduce_max_tokens, fanout, count_tokens):
+        self.client = client
+        self.api_key = api_key
+        self.model = model
+        self.params = params
+        self.reduce_max_tokens = reduce_max_tokens
+        self.fanout = fanout
+        self.count_tokens = count_tokens
+        self.semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self.calls = 0
+        self.levels = 0
+
+    def payload(self, template, text):
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": template.format(text=text)}],
+            **self.params
+        }
+
+    async def complete(self, template, text, label):
+        async with self.semaphore:
+            try:
+                response_data = await self.client.chat_completion(self.payload(template, text), self.api_key)
+            except NvidiaAPIError as e:
+                raise SummarizationError(f"Summarizing {label} failed: {str(e)}") from e
+        self.calls += 1
+        content = (response_data.get("choices") or [{}])[0].get("message", {}).get("content", "").strip()
+        if not content:
+            raise SummarizationError(f"Summarizing {label} returned no text")
+        return content
+
+    async def collapse(self, sections):
+        """Map the sections and reduce level by level until one call can produce the final summary.
+
+        Returns the (template, text) of that final call.
+        """
+        if len(sections) == 1:
+            self.levels = 1
+            return MAP_PROMPT_TEMPLATE, sections[0]
+
+        summaries = await _gather_or_cancel([
+            self.complete(MAP_PROMPT_TEMPLATE, section, f"section {i + 1}") for i, section in enumerate(sections)
+        ])
+        self.levels = 1
+        logger.info(f"Summarized {len(sections)} sections")
+
+        while True:
+            groups = group_summaries(summaries, self.reduce_max_tokens, self.fanout, self.count_tokens)
+            self.levels += 1
+            if len(groups) == 1:
+                return REDUCE_PROMPT_TEMPLATE, "\n\n".join(groups[0])
+            summaries = await _gather_or_cancel([
+                self.complete(REDUCE_PROMPT_TEMPLATE, "\n\n".join(group), f"group {i + 1} at level {self.levels}")
+                if len(group) > 1 else asyncio.sleep(0, result=group[0])
+                for i, group in enumerate(groups)
+            ])
+            logger.info(f"Reduced to {len(summaries)} summaries at level {self.levels}")
+
+    def stats(self, sections):
+        return {"sections": len(sections), "levels": self.levels, "calls": self.calls}
+
+
+async def map_reduce_summary(client, sections, api_key, model, params, max_concurrency=4,
+                             reduce_max_tokens=3000, fanout=8, count_tokens=None):
+    """Summarize sections concurrently, then merge the partial summaries level by level until one is left.
+
+    At most max_concurrency completions are in flight at any time. Returns the
+    summary and a dict with the number of sections, levels and LLM calls.
+    """
+    if not sections:
+        raise SummarizationError("Nothing to summarize")
+    run = _MapReduce(client, api_key, model, params, max_concurrency, reduce_max_tokens, fanout, count_tokens)
+    template, text = await run.collapse(sections)
+    summary = await run.complete(template, text, "final summary")
+    return summary, run.stats(sections)
+
+
+async def stream_map_reduce_summary(client, sections, api_key, model, params, max_concurrency=4,
+                                    reduce_max_tokens=3000, fanout=8, count_tokens=None):
+    """Like map_reduce_summary, but yields the text of the final call as it is generated.
+
+    The last item yielded is the stats dict instead of text.
+    """
+    if not sections:
+        raise SummarizationError("Nothing to summarize")
+    run = _MapReduce(client, api_key, model, params, max_concurrency, reduce_max_tokens, fanout, count_tokens)
+    template, text = await run.collapse(sections)
+    try:
+        async for delta in client.stream_chat_completion(run.payload(template, text), api_key):
+            yield delta
+    except NvidiaAPIError as e:
+        raise SummarizationError(f"Summarizing final summary failed: {str(e)}") from e
+    run.calls += 1
+    yield run.stats(sections)
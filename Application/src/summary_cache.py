@@ -0,0 +1,69 @@
+# src/summary_cache.py
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryCache:
+    """Persistent store of generated summaries in a local SQLite file.
+
+    Entries are keyed by a hash of everything that shapes the summary: the file,
+    its content identity, the model, the prompt template and the sampling
+    parameters. Changing any of them simply misses and produces a new entry.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "key TEXT PRIMARY KEY, file_key TEXT NOT NULL, content_key TEXT NOT NULL, "
+            "summary TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS summaries_file_key ON summaries (file_key)")
+        self._db.commit()
+
+    @staticmethod
+    def key_for(file_key, content_key, model, prompt_template, params):
+        identity = json.dumps(
+            {"file_key": file_key, "content": content_key, "model": model,
+             "prompt": prompt_template, "params": params},
+            sort_keys=True
+        )
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            self._stats["hits" if row else "misses"] += 1
+        return row[0] if row else None
+
+    def put(self, key, file_key, content_key, summary):
+        with self._lock:
+            # Older versions of the same file can never be hit again
+            self._db.execute(
+                "DELETE FROM summaries WHERE file_key = ? AND content_key != ?", (file_key, content_key)
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO summaries (key, file_key, content_key, summary, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, file_key, content_key, summary, time.time())
+            )
+            self._db.commit()
+            self._stats["writes"] += 1
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+            return {**self._stats, "entries": entries}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,140 @@
+# src/text_cache.py
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractedTextCache:
+    """Size-bounded LRU cache of per-page PDF text on local disk.
+
+    Entries are keyed by content identity (an S3 ETag or a hash of the PDF bytes),
+    so the same document is parsed once no matter which endpoint asks for it.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # file name -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def key_for_etag(etag, size):
+        etag = etag.strip('"')
+        return f"etag:{etag}:{size}"
+
+    @staticmethod
+    def key_for_content(content):
+        return f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+    def get(self, key):
+        """Return the cached page texts for a key, or None"""
+        name = self._file_name(key)
+        path = os.path.join(self.cache_dir, name)
+        with self._lock:
+            if name not in self._entries:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                pages = json.load(f)["pages"]
+            os.utime(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Dropping unreadable text cache entry {name}: {str(e)}")
+            self._remove(name)
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+        return pages
+
+    def put(self, key, pages):
+        name = self._file_name(key)
+        data = json.dumps({"key": key, "pages": pages}).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        # Write to a temp file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(self.cache_dir, name))
+        except OSError as e:
+            logger.warning(f"Could not write text cache entry {name}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            self._total_bytes += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._stats["writes"] += 1
+            evicted = self._evict_locked()
+        for old in evicted:
+            self._unlink(old)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else None,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _load_index(self):
+        # Rebuild the LRU order from file modification times
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".tmp"):
+                # Leftovers of an interrupted write; recent ones may belong to another worker
+                if time.time() - os.path.getmtime(path) > 3600:
+                    os.remove(path)
+            elif name.endswith(".json"):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+        evicted = self._evict_locked()
+        for old in evicted:
+            self._unlink(old)
+
+    def _evict_locked(self):
+        evicted = []
+        while self._total_bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self._stats["evictions"] += 1
+            evicted.append(name)
+        return evicted
+
+    def _remove(self, name):
+        with self._lock:
+            self._total_bytes -= self._entries.pop(name, 0)
+        self._unlink(name)
+
+    def _unlink(self, name):
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _file_name(key):
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json"
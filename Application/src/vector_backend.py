@@ -0,0 +1,210 @@
+# src/vector_backend.py
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from urllib.parse import quote
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class VectorBackendError(Exception):
+    """Raised when vectors cannot be stored or queried"""
+
+
+class VectorBackend(ABC):
+    """Storage for per-document chunk vectors.
+
+    Vectors are dicts with "id", "values" and "metadata"; query returns matches
+    as dicts with "id", "score" and "metadata", best first. Subclasses must
+    implement upsert, query and exists before they can be constructed.
+    """
+
+    @abstractmethod
+    def upsert(self, document_id, vectors, progress=None):
+        """Store a document's vectors; progress, if given, receives the number stored so far"""
+
+    @abstractmethod
+    def query(self, document_id, vector, top_k=3):
+        """The top_k matches for vector within one document"""
+
+    @abstractmethod
+    def exists(self, document_id):
+        """Whether any vectors are stored for the document"""
+
+    def stats(self):
+        return {"backend": type(self).__name__}
+
+    def close(self):
+        pass
+
+
+class PineconeBackend(VectorBackend):
+    """All documents in one Pinecone index, separated by a document_id metadata filter"""
+
+    def __init__(self, index, dimension=1024, batch_size=50):
+        self.index = index
+        self.dimension = dimension
+        self.batch_size = batch_size
+
+    def upsert(self, document_id, vectors, progress=None):
+        # Upsert in batches to avoid exceeding the request size limit
+        for i in range(0, len(vectors), self.batch_size):
+            batch = vectors[i:i + self.batch_size]
+            try:
+                logger.info(f"Upserting batch {i // self.batch_size + 1} of embeddings to Pinecone")
+                self.index.upsert(vectors=batch)
+            except Exception as e:
+                logger.error(f"Failed to upsert batch {i // self.batch_size + 1}: {str(e)}")
+                raise VectorBackendError(f"Failed to upsert embeddings batch: {str(e)}")
+            if progress:
+                progress(i + len(batch))
+
+    def query(self, document_id, vector, top_k=3):
+        result = self.index.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=True,
+            filter={"document_id": document_id}
+        )
+        return [
+            {"id": match['id'], "score": match['score'], "metadata": match['metadata']}
+            for match in result['matches']
+        ]
+
+    def exists(self, document_id):
+        # Pinecone has no metadata lookup, so probe with a dummy vector restricted to the document
+        try:
+            query_response = self.index.query(
+                vector=[0] * self.dimension,
+                top_k=1,
+                include_metadata=False,
+                filter={"document_id": {"$eq": document_id}}
+            )
+            return len(query_response['matches']) > 0
+        except Exception as e:
+            logger.error(f"Error checking existing embeddings: {str(e)}")
+            return False
+
+
+class _DocumentVectors:
+    def __init__(self, matrix, ids, metadata):
+        self.matrix = matrix  # unit-length float32 rows, memory-mapped
+        self.ids = ids
+        self.metadata = metadata
+
+
+class LocalVectorBackend(VectorBackend):
+    """Per-document vector files on local disk, searched with exact cosine similarity.
+
+    Each document is a directory holding a float32 .npy matrix of unit-length rows,
+    opened memory-mapped, and a JSON file with the chunk ids and metadata. Recently
+    queried documents stay open, so a query is a single matrix-vector product.
+    """
+
+    def __init__(self, root_dir, max_open_documents=256):
+        self.root_dir = root_dir
+        self.max_open_documents = max_open_documents
+        self._open = OrderedDict()  # document_id -> _DocumentVectors
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "loads": 0, "upserts": 0}
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _document_dir(self, document_id):
+        return os.path.join(self.root_dir, quote(document_id, safe=""))
+
+    def _load(self, document_id):
+        # Files are read under the lock so a concurrent upsert is never seen half-written
+        with self._lock:
+            document = self._open.get(document_id)
+            if document is not None:
+                self._open.move_to_end(document_id)
+                return document
+
+            path = self._document_dir(document_id)
+            try:
+                with open(os.path.join(path, "chunks.json"), "r", encoding="utf-8") as f:
+                    chunks = json.load(f)
+                matrix = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+            except FileNotFoundError:
+                return None
+            if matrix.shape[0] != len(chunks["ids"]):
+                raise VectorBackendError(f"Vector files for {document_id} are inconsistent")
+            document = _DocumentVectors(matrix, chunks["ids"], chunks["metadata"])
+
+            self._stats["loads"] += 1
+            self._open[document_id] = document
+            while len(self._open) > self.max_open_documents:
+                self._open.popitem(last=False)
+            return document
+
+    def upsert(self, document_id, vectors, progress=None):
+        if not vectors:
+            return
+        existing = self._load(document_id)
+        ids, metadata, rows = [], [], []
+        if existing is not None:
+            ids, metadata, rows = list(existing.ids), list(existing.metadata), list(np.asarray(existing.matrix))
+        positions = {chunk_id: i for i, chunk_id in enumerate(ids)}
+
+        for item in vectors:
+            values = np.asarray(item["values"], dtype=np.float32)
+            norm = np.linalg.norm(values)
+            values = values / norm if norm else values
+            if item["id"] in positions:
+                rows[positions[item["id"]]] = values
+                metadata[positions[item["id"]]] = item.get("metadata", {})
+            else:
+                positions[item["id"]] = len(ids)
+                ids.append(item["id"])
+                metadata.append(item.get("metadata", {}))
+                rows.append(values)
+        matrix = np.vstack(rows).astype(np.float32, copy=False)
+
+        path = self._document_dir(document_id)
+        try:
+            os.makedirs(path, exist_ok=True)
+            # Write both files under temporary names, then swap them in together
+            with open(os.path.join(path, "vectors.npy.tmp"), "wb") as f:
+                np.save(f, matrix)
+            with open(os.path.join(path, "chunks.json.tmp"), "w", encoding="utf-8") as f:
+                json.dump({"ids": ids, "metadata": metadata}, f)
+            with self._lock:
+                self._open.pop(document_id, None)
+                os.replace(os.path.join(path, "vectors.npy.tmp"), os.path.join(path, "vectors.npy"))
+                os.replace(os.path.join(path, "chunks.json.tmp"), os.path.join(path, "chunks.json"))
+                self._stats["upserts"] += 1
+        except OSError as e:
+            raise VectorBackendError(f"Failed to write vectors for {document_id}: {str(e)}")
+        if progress:
+            progress(len(vectors))
+        logger.info(f"Stored {len(ids)} vectors for {document_id} in {path}")
+
+    def query(self, document_id, vector, top_k=3):
+        document = self._load(document_id)
+        with self._lock:
+            self._stats["queries"] += 1
+        if document is None:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = document.matrix @ (query / norm if norm else query)
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            {"id": document.ids[i], "score": float(scores[i]), "metadata": document.metadata[i]}
+            for i in best
+        ]
+
+    def exists(self, document_id):
+        return os.path.exists(os.path.join(self._document_dir(document_id), "chunks.json"))
+
+    def stats(self):
+        with self._lock:
+            return {"backend": type(self).__name__, **self._stats, "open_documents": len(self._open)}
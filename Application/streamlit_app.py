@@ -4,6 +4,7 @@ from streamlit_pdf_viewer import pdf_viewer
 import requests
 from dotenv import load_dotenv
 import os
+import json
 from datetime import datetime
 import boto3
 import snowflake.connector
@@ -97,18 +98,6 @@ def fetch_pdf_binary(pdf_link):
         st.error("Failed to fetch PDF.")
         return None
 
-def fetch_summary(pdf_link):
-    response = requests.post(
-        f"{API_URL}/summarize",
-        headers={"Authorization": f"Bearer {st.session_state['access_token']}"},
-        json={"pdf_link": pdf_link}
-    )
-    if response.status_code == 200:
-        return response.json()["summary"]
-    else:
-        st.error(f"Failed to fetch summary. Error: {response.json().get('detail', 'Unknown error')}")
-        return None
-        
 # Page Functions
 def registration_page():
     st.subheader("Register")
@@ -165,28 +154,80 @@ def main_menu():
         st.session_state["access_token"] = None
         st.session_state["page"] = "auth"
 
-def fetch_summary(pdf_link):
-    file_key = pdf_link.split('/', 3)[-1].split('?')[0]  # Remove query params
-
+def iter_sse(response):
+    """Yield (event, data) pairs from a text/event-stream response as they arrive"""
+    response.encoding = "utf-8"
+    event, data = "message", []
+    # chunk_size=None hands over each network read immediately instead of waiting for 512 bytes
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+def stream_text(path, payload, status=None):
+    """Yield the text of a streaming backend endpoint, for use with st.write_stream"""
     response = requests.post(
-        f"{API_URL}/summarize",
+        f"{API_URL}{path}",
         headers={"Authorization": f"Bearer {st.session_state['access_token']}"},
-        json={"file_key": file_key}
+        json=payload,
+        stream=True
     )
+    with response:
+        if response.status_code != 200:
+            st.error(f"Request failed. Error: {response.json().get('detail', 'Unknown error')}")
+            return
+        for event, data in iter_sse(response):
+            if event == "status" and status is not None:
+                status.caption(data["message"])
+                continue
+            if status is not None:
+                status.empty()
+            if event == "token":
+                yield data["text"]
+            elif event == "context":
+                yield data["text"] + "\n\n"
+            elif event == "indexing" and data["status"] == "indexed_now":
+                st.success(f"Embedding created and saved successfully ({data['chunk_count']} chunks).")
+            elif event == "error":
+                st.error(data["detail"])
+                return
+
+def stream_summary(pdf_link, mode="quick", status=None):
+    file_key = pdf_link.split('/', 3)[-1].split('?')[0]  # Remove query params
+    return stream_text("/summarize/stream", {"file_key": file_key, "mode": mode}, status)
+
+def fetch_pdf_page(after=None, limit=None, fields=None):
+    """Fetch one page of the catalog, the total number of PDFs and the cursor of the next page"""
+    # Revalidate the copy from the last rerun instead of downloading it again
+    headers = {"Authorization": f"Bearer {st.session_state['access_token']}"}
+    params = {key: value for key, value in {"after": after, "limit": limit, "fields": fields}.items() if value}
+    cache_key = f"pdf_catalog_{after}_{limit}_{fields}"
+    cached = st.session_state.get(cache_key)
+    if cached:
+        headers["If-None-Match"] = cached["etag"]
+
+    response = requests.get(f"{API_URL}/pdfs", headers=headers, params=params)
+    if response.status_code == 304 and cached:
+        return cached["items"], cached["total"], cached["next"]
     if response.status_code == 200:
-        return response.json()["summary"]
-    else:
-        error_message = response.json().get('detail', 'Unknown error')
-        st.error(f"Failed to fetch summary. Error: {error_message}")
-        return None
-    
-def fetch_pdf_info_from_snowflake():
-    response = requests.get(f"{API_URL}/pdfs", headers={"Authorization": f"Bearer {st.session_state['access_token']}"})
-    if response.status_code == 200:
-        return response.json()
+        items = response.json()
+        total = int(response.headers.get("X-Total-Count", len(items)))
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if response.headers.get("ETag"):
+            st.session_state[cache_key] = {"etag": response.headers["ETag"], "items": items, "total": total, "next": next_cursor}
+        return items, total, next_cursor
     else:
         st.error("Failed to fetch PDF info from the API")
-        return []
+        return [], 0, None
+
+def fetch_pdf_info_from_snowflake():
+    items, _, _ = fetch_pdf_page()
+    return items
 
 def pdf_view_option():
     temp_view_type = st.radio("Choose View Type", ["Grid View", "Dropdown View"], key="view_type_radio")
@@ -200,8 +241,18 @@ def pdf_view_option():
 
     if st.button("Back"):
         st.session_state["page"] = "main"
+GRID_PAGE_SIZE = 30
+
 def pdf_list_grid_view():
-    pdf_items = fetch_pdf_info_from_snowflake()
+    # Only the current page is fetched, so the backend signs at most GRID_PAGE_SIZE rows.
+    # grid_cursors[i] is the cursor that starts page i.
+    grid_cursors = st.session_state.setdefault("grid_cursors", [None])
+    grid_page = min(st.session_state.get("grid_page", 0), len(grid_cursors) - 1)
+    pdf_items, total, next_cursor = fetch_pdf_page(
+        after=grid_cursors[grid_page],
+        limit=GRID_PAGE_SIZE,
+        fields="Title,url,image_url"
+    )
     if not pdf_items:
         st.warning("No PDFs found.")
         return
@@ -219,6 +270,21 @@ def pdf_list_grid_view():
                     st.session_state['previous_page'] = "pdf_list_grid_view"  # Store the previous page
                     st.session_state["page"] = 'pdf_detail_view'
 
+    page_count = max(1, -(-total // GRID_PAGE_SIZE))
+    prev_col, info_col, next_col = st.columns(3)
+    with prev_col:
+        if st.button("Previous Page", disabled=grid_page == 0):
+            st.session_state["grid_page"] = grid_page - 1
+            st.rerun()
+    with info_col:
+        st.markdown(f"Page {grid_page + 1} of {page_count}")
+    with next_col:
+        if st.button("Next Page", disabled=next_cursor is None):
+            del grid_cursors[grid_page + 1:]
+            grid_cursors.append(next_cursor)
+            st.session_state["grid_page"] = grid_page + 1
+            st.rerun()
+
     if st.button("Back to View Options"):
         st.session_state["page"] = "pdf_view_option"
 
@@ -263,11 +329,12 @@ def pdf_detail_view():
                     pdf_viewer(input=pdf_binary_data, width=700, height=800)
     
     with col2:
+        summary_mode = st.radio("Summary Type", ["Quick", "Full"], key="summary_mode_radio", horizontal=True,
+                                help="Quick summarizes the opening of the document; Full reads the whole PDF.")
         if st.button("Summarize PDF"):
-            summary = fetch_summary(item["url"])
-            if summary:
-                st.markdown("### Summary")
-                st.write(summary)
+            st.markdown("### Summary")
+            status = st.empty()
+            st.write_stream(stream_summary(item["url"], summary_mode.lower(), status))
 
     if st.button("Back to PDF List"):
         if st.session_state.get('previous_page') == "pdf_list_grid_view":
@@ -322,36 +389,15 @@ def qa_with_bot():
 
         if st.button("Submit Question"):
             if question:
-                # Create embedding for the selected PDF without using conversation history
-                response = requests.post(
-                    f"{API_URL}/embed",
-                    headers={"Authorization": f"Bearer {st.session_state['access_token']}"},
-                    json={"pdf_link": selected_pdf["url"]}
-                )
-
-                if response.status_code == 200:
-                    embedding_id = response.json().get("document_id")
-                    if "message" in response.json() and response.json()["message"] == "Embeddings already exist":
-                        st.info(f"Using existing embeddings. Document ID: {embedding_id}")
-                    else:
-                        st.success(f"Embedding created and saved successfully. Document ID: {embedding_id}")
-
-                    # Send only the current question to the bot API
-                    bot_response = requests.post(
-                        f"{API_URL}/chat",
-                        headers={"Authorization": f"Bearer {st.session_state['access_token']}"},
-                        json={"user_input": question, "document_id": embedding_id}
-                    )
-
-                    if bot_response.status_code == 200:
-                        answer = bot_response.json().get("response", "No answer provided.")
-                        st.write("Answer:", answer)
-                        # Append new Q&A to chat history for display only
-                        st.session_state.chat_history.append((question, answer))
-                    else:
-                        st.error("Failed to retrieve answer from bot.")
-                else:
-                    st.error("Failed to create or retrieve embeddings for the PDF.")
+                # One request indexes the PDF if needed and streams the answer to the current question
+                st.write("Answer:")
+                status = st.empty()
+                answer = st.write_stream(stream_text(
+                    "/ask/stream", {"pdf_link": selected_pdf["url"], "question": question}, status
+                ))
+                if answer:
+                    # Append new Q&A to chat history for display only
+                    st.session_state.chat_history.append((question, answer))
             else:
                 st.warning("Please enter a question to ask.")
 
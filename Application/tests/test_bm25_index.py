@@ -0,0 +1,23 @@
+from src.bm25_index import auto_retrieval_mode, identifier_terms, tokenize
+
+
+def covers_everything(terms):
+    return True
+
+
+def test_natural_language_questions_stay_on_vector_search():
+    for question in ("What is the conclusion?", "How do the authors define liquidity risk?", "Summarize the findings"):
+        assert identifier_terms(question) == []
+        assert auto_retrieval_mode(question, covers_everything) == "vector"
+
+
+def test_identifier_lookups_use_keyword_search():
+    assert identifier_terms("What does the 10-K say about EBITDA in 2023?") == ["10-K", "EBITDA", "2023"]
+    assert auto_retrieval_mode("EBITDA 2023", covers_everything) == "lexical"
+    assert auto_retrieval_mode("EBITDA 2023", lambda terms: False) == "hybrid"
+
+
+def test_long_identifier_questions_use_hybrid_search():
+    question = "How did EBITDA margins compare with revenue growth and leverage across regions in 2023?"
+    assert len(tokenize(question)) > 4
+    assert auto_retrieval_mode(question, covers_everything) == "hybrid"
@@ -0,0 +1,30 @@
+from src.catalog_cache import CatalogSnapshot, paginate
+
+
+def collect(snapshot, **kwargs):
+    titles, cursor = [], None
+    while True:
+        page, cursor = paginate(snapshot, after=cursor, **kwargs)
+        titles.extend(row["PDF_Link"] for row in page)
+        if cursor is None:
+            return titles
+
+
+def test_duplicate_titles_are_not_skipped_across_pages():
+    rows = [{"Title": title, "Date": "2024-01-01", "Image_Link": "img", "PDF_Link": f"s3://b/{i}.pdf"}
+            for i, title in enumerate(["A", "B", "B", "C", "B"])]
+    snapshot = CatalogSnapshot(rows, 0)
+    for sort in ("title", "date"):
+        for descending in (False, True):
+            links = collect(snapshot, sort=sort, descending=descending, limit=2)
+            assert sorted(links) == sorted(row["PDF_Link"] for row in rows)
+            assert len(links) == len(set(links))
+
+
+def test_required_field_keeps_pages_full():
+    rows = [{"Title": f"T{i:02d}", "Image_Link": "img" if i % 3 else None, "PDF_Link": f"s3://b/{i}.pdf"}
+            for i in range(30)]
+    snapshot = CatalogSnapshot(rows, 0)
+    page, cursor = paginate(snapshot, limit=10, require="Image_Link")
+    assert len(page) == 10 and cursor is not None
+    assert len(collect(snapshot, limit=10, require="Image_Link")) == 20
@@ -0,0 +1,83 @@
+# benchmarks/bench_embed.py
+"""Compare one-text-at-a-time embedding with TextEncoder.embed_many on CPU, in documents per second.
+
+Documents are synthetic texts of random length. The single-text baseline is the
+previous VectorStore.generate_embedding loop: no_grad and a mean over every
+position. Batched output is also checked against it by cosine similarity.
+
+Run from the Search System directory:
+
+    python -m benchmarks.bench_embed --docs 256 --batch-sizes 8 32 --max-batch-tokens 2048 --threads 4
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+import torch
+
+from src.encoder import DEFAULT_MODEL, TextEncoder
+
+WORDS = (
+    "economic growth inflation liquidity duration risk factor investing fixed income markets requires careful "
+    "treatment of the and a in portfolio returns volatility equity credit spread yield curve central bank policy "
+    "research analysts expect earnings revenue margin valuation"
+).split()
+
+
+def build_documents(count, min_words, max_words, seed):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))) for _ in range(count)]
+
+
+def embed_one_at_a_time(encoder, texts):
+    embeddings = []
+    for text in texts:
+        inputs = encoder.tokenizer(text, return_tensors="pt", truncation=True,
+                                   max_length=encoder.max_length, padding=True)
+        with torch.no_grad():
+            outputs = encoder.model(**inputs)
+        embeddings.append(outputs.last_hidden_state.mean(dim=1).numpy()[0])
+    return np.vstack(embeddings)
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def min_cosine(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return float((a * b).sum(axis=1).min())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--docs", type=int, default=256)
+    parser.add_argument("--min-words", type=int, default=20)
+    parser.add_argument("--max-words", type=int, default=600)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--max-batch-tokens", type=int, default=2048)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads, 0 keeps the torch default")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    encoder = TextEncoder(args.model, max_batch_tokens=args.max_batch_tokens, num_threads=args.threads or None)
+    texts = build_documents(args.docs, args.min_words, args.max_words, args.seed)
+    encoder.embed_many(texts[:4])  # warm-up
+
+    print(f"{args.docs} documents of {args.min_words}-{args.max_words} words, {torch.get_num_threads()} threads")
+    print(f"{'mode':>16} {'seconds':>8} {'docs/s':>8} {'speedup':>8} {'min cos':>8}")
+    baseline_seconds, baseline = timed(lambda: embed_one_at_a_time(encoder, texts))
+    print(f"{'one at a time':>16} {baseline_seconds:>8.2f} {args.docs / baseline_seconds:>8.1f} {1.0:>8.2f} {1.0:>8.4f}")
+    for batch_size in args.batch_sizes:
+        seconds, embeddings = timed(lambda: encoder.embed_many(texts, batch_size=batch_size))
+        print(f"{f'batch {batch_size}':>16} {seconds:>8.2f} {args.docs / seconds:>8.1f} "
+              f"{baseline_seconds / seconds:>8.2f} {min_cosine(baseline, embeddings):>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
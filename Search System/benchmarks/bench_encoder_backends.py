@@ -0,0 +1,153 @@
+# benchmarks/bench_encoder_backends.py
+"""Compare the torch, onnx and onnx-int8 encoder backends on CPU.
+
+Each backend runs in its own process, so peak RSS and load time are measured
+in isolation. ONNX models are exported and quantized before timing starts.
+Reported per backend: load time (imports included), first call, single-query
+latency p50/p95, batch throughput in documents/s and peak RSS. Embeddings are
+checked against the torch backend by cosine similarity; the run fails if any
+falls below --min-cosine.
+
+Run from the Search System directory:
+
+    python -m benchmarks.bench_encoder_backends --docs 128 --queries 50 --threads 4
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from src.encoder import BACKENDS, DEFAULT_MODEL, cosine_parity
+
+SEARCH_SYSTEM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = (
+    "economic growth inflation liquidity duration risk factor investing fixed income markets requires careful "
+    "treatment of the and a in portfolio returns volatility equity credit spread yield curve central bank policy "
+    "research analysts expect earnings revenue margin valuation"
+).split()
+
+CHILD = '''
+import json
+import resource
+import sys
+import time
+
+import numpy as np
+
+config = json.load(open(sys.argv[1]))
+with open(config["texts"]) as f:
+    texts = json.load(f)
+
+started = time.perf_counter()
+from src.encoder import create_encoder
+encoder = create_encoder(config["backend"], config["model"], cache_dir=config["cache_dir"],
+                         num_threads=config["threads"] or None)
+loaded = time.perf_counter()
+if config["prepare"]:
+    sys.exit(0)
+encoder.embed(texts["queries"][0])
+first_call = time.perf_counter()
+
+latencies = []
+for query in texts["queries"]:
+    query_started = time.perf_counter()
+    encoder.embed(query)
+    latencies.append(time.perf_counter() - query_started)
+
+batch_started = time.perf_counter()
+embeddings = encoder.embed_many(texts["documents"])
+batch_seconds = time.perf_counter() - batch_started
+np.save(config["output"], embeddings)
+
+print(json.dumps({
+    "load": loaded - started,
+    "first_call": first_call - loaded,
+    "latencies": latencies,
+    "docs_per_second": len(texts["documents"]) / batch_seconds,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+'''
+
+
+def build_texts(documents, queries, seed):
+    rng = random.Random(seed)
+
+    def text(min_words, max_words):
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+    return {"documents": [text(50, 300) for _ in range(documents)], "queries": [text(3, 15) for _ in range(queries)]}
+
+
+def run_child(workdir, config):
+    path = os.path.join(workdir, f"{config['backend']}.json")
+    with open(path, "w") as f:
+        json.dump(config, f)
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, path], cwd=SEARCH_SYSTEM_DIR, capture_output=True, text=True,
+        env={**os.environ, "PYTHONPATH": SEARCH_SYSTEM_DIR}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{config['backend']} run failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1]) if not config["prepare"] else None
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--docs", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads, 0 keeps each runtime's default")
+    parser.add_argument("--cache-dir", default="onnx_models")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backends = ["torch"] + [backend for backend in args.backends if backend != "torch"]
+    results, embeddings = {}, {}
+    with tempfile.TemporaryDirectory() as workdir:
+        texts_path = os.path.join(workdir, "texts.json")
+        with open(texts_path, "w") as f:
+            json.dump(build_texts(args.docs, args.queries, args.seed), f)
+
+        for backend in backends:
+            config = {
+                "backend": backend, "model": args.model, "cache_dir": os.path.abspath(args.cache_dir),
+                "threads": args.threads, "texts": texts_path, "output": os.path.join(workdir, f"{backend}.npy"),
+            }
+            if backend != "torch":
+                run_child(workdir, {**config, "prepare": True})  # export and quantize outside the timings
+            results[backend] = run_child(workdir, {**config, "prepare": False})
+            embeddings[backend] = np.load(config["output"])
+
+    print(f"{args.docs} documents, {args.queries} queries, threads={args.threads or 'default'}")
+    print(f"{'backend':>10} {'load s':>7} {'first s':>8} {'p50 ms':>7} {'p95 ms':>7} {'docs/s':>7} "
+          f"{'rss MB':>7} {'min cos':>8} {'mean cos':>9}")
+    failures = []
+    for backend in backends:
+        result = results[backend]
+        min_cosine, mean_cosine = cosine_parity(embeddings["torch"], embeddings[backend])
+        print(f"{backend:>10} {result['load']:>7.2f} {result['first_call']:>8.3f} "
+              f"{statistics.median(result['latencies']) * 1000:>7.1f} {percentile(result['latencies'], 0.95) * 1000:>7.1f} "
+              f"{result['docs_per_second']:>7.1f} {result['peak_rss_mb']:>7.0f} {min_cosine:>8.4f} {mean_cosine:>9.4f}")
+        if min_cosine < args.min_cosine:
+            failures.append(f"{backend} min cosine {min_cosine:.4f} is below {args.min_cosine}")
+    if failures:
+        print("PARITY FAILURE: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/bench_pipeline.py
+"""Compare serial store_document calls with the pipelined IngestionPipeline.
+
+S3 and Pinecone are replaced by stand-ins that sleep for --fetch-latency per
+download and --upsert-latency per upsert request; PDFs are generated text-only
+documents and the encoder is real. Prints documents/s for both runs and the
+pipeline's per-stage throughput, utilization and queue depths.
+
+Run from the Search System directory:
+
+    python -m benchmarks.bench_pipeline --docs 40 --pages 4 20 --fetch-latency 0.3 --parse-workers 3
+"""
+import argparse
+import random
+import time
+
+from src.encoder import DEFAULT_MODEL, create_encoder
+from src.pipeline import IngestionPipeline, PipelineDocument
+from src.vector_store import VectorStore
+
+WORDS = (
+    "economic growth inflation liquidity duration risk factor investing fixed income markets requires careful "
+    "treatment of the and a in portfolio returns volatility equity credit spread yield curve central bank policy"
+).split()
+
+
+def build_pdf(lines):
+    """A text-only PDF with one page per list of lines"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for page_lines in lines:
+        text = "\n".join(f"({line}) Tj 0 -14 Td" for line in page_lines)
+        stream = f"BT /F1 9 Tf 40 780 Td\n{text}\nET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode("ascii")
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_refs)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
+
+
+class _StandInIndex:
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self.vectors = 0
+
+    def upsert(self, vectors):
+        time.sleep(self.latency)
+        self.requests += 1
+        self.vectors += len(vectors)
+
+    def list(self, prefix):
+        return iter([])
+
+    def delete(self, ids):
+        pass
+
+
+class _StandInStore(VectorStore):
+    def __init__(self, pdfs, encoder, fetch_latency, upsert_latency):
+        self.pdfs = pdfs
+        self.fetch_latency = fetch_latency
+        self.encoder = encoder
+        self.chunk_tokens, self.chunk_overlap = 256, 32
+        self.store_document_vector = True
+        self.upsert_batch_size = 100
+        self.index = _StandInIndex(upsert_latency)
+
+    def fetch_pdf(self, s3_uri, max_retries=3):
+        time.sleep(self.fetch_latency)
+        return self.pdfs[s3_uri]
+
+
+def build_documents(count, min_pages, max_pages, seed):
+    rng = random.Random(seed)
+    pdfs = {}
+    for i in range(count):
+        pages = [[" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(40)]
+                 for _ in range(rng.randint(min_pages, max_pages))]
+        pdfs[f"s3://bench/doc-{i}.pdf"] = build_pdf(pages)
+    return pdfs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--docs", type=int, default=40)
+    parser.add_argument("--pages", type=int, nargs=2, default=[4, 20], metavar=("MIN", "MAX"))
+    parser.add_argument("--fetch-latency", type=float, default=0.3)
+    parser.add_argument("--upsert-latency", type=float, default=0.1)
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    parser.add_argument("--parse-workers", type=int, default=0, help="0 means CPU cores - 1")
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--skip-serial", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pdfs = build_documents(args.docs, args.pages[0], args.pages[1], args.seed)
+    encoder = create_encoder(args.backend, args.model)
+    documents = lambda: [PipelineDocument(uri, uri, uri.rsplit("/", 1)[-1][:-4]) for uri in pdfs]
+
+    if not args.skip_serial:
+        store = _StandInStore(pdfs, encoder, args.fetch_latency, args.upsert_latency)
+        started = time.perf_counter()
+        stored = sum(store.store_document(document.s3_uri, document.title) for document in documents())
+        serial_seconds = time.perf_counter() - started
+        print(f"serial:    {stored}/{args.docs} documents in {serial_seconds:.1f}s "
+              f"({stored / serial_seconds:.2f} documents/s)")
+
+    store = _StandInStore(pdfs, encoder, args.fetch_latency, args.upsert_latency)
+    pipeline = IngestionPipeline(store, fetch_workers=args.fetch_workers, parse_workers=args.parse_workers or None,
+                                 queue_size=args.queue_size, report_interval=0)
+    summary = pipeline.run(documents())
+    print(f"pipelined: {summary['succeeded']}/{args.docs} documents in {summary['seconds']:.1f}s "
+          f"({summary['documents_per_second']:.2f} documents/s), {store.index.requests} upsert requests, "
+          f"bottleneck: {summary['bottleneck']}")
+    if not args.skip_serial:
+        print(f"speedup:   {serial_seconds / summary['seconds']:.2f}x")
+    print(f"{'stage':>8} {'done':>5} {'per s':>6} {'busy s':>7} {'util':>5} {'workers':>7}")
+    for name, stage in summary["stages"].items():
+        print(f"{name:>8} {stage['processed']:>5} {stage['per_second']:>6.2f} {stage['busy_seconds']:>7.2f} "
+              f"{stage['utilization']:>5.0%} {stage['workers']:>7}")
+    for name, depth in summary["queues"].items():
+        print(f"queue {name}: max {depth['max']}/{depth['capacity']}, mean {depth['mean']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 # main.py
 from src.vector_store import VectorStore
+from src.pipeline import IngestionPipeline, PipelineDocument
+from src.manifest import IngestionManifest, document_id_for
 import boto3
 import logging
 from tqdm import tqdm
@@ -10,7 +12,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def list_s3_pdfs(bucket_name):
-    """List all PDF files in the S3 bucket"""
+    """List all PDF files in the S3 bucket with their ETag and size, or None if the listing fails"""
     try:
         s3_client = boto3.client(
             's3',
@@ -26,12 +28,13 @@ def list_s3_pdfs(bucket_name):
             if 'Contents' in page:
                 for obj in page['Contents']:
                     if obj['Key'].lower().endswith('.pdf'):
-                        pdf_files.append(obj['Key'])
+                        pdf_files.append({"key": obj['Key'], "etag": obj['ETag'], "size": obj['Size']})
         
         return pdf_files
     except Exception as e:
         logger.error(f"Error listing S3 files: {e}")
-        return []
+        # An empty listing would look like every PDF was removed, so report the failure instead
+        return None
 
 def main():
     load_dotenv()
@@ -40,45 +43,83 @@ def main():
     vs = VectorStore()
     bucket_name = os.getenv('AWS_BUCKET')
     
+    manifest = IngestionManifest(os.getenv('INGEST_MANIFEST_PATH', 'ingest_manifest.sqlite3'), bucket_name)
+    
     try:
         # Get list of PDF files from S3
         pdf_files = list_s3_pdfs(bucket_name)
+        if pdf_files is None:
+            return
         logger.info(f"Found {len(pdf_files)} PDF files in S3 bucket")
         
-        # Create progress bar
-        success_count = 0
-        failed_count = 0
+        # Only new and changed PDFs are processed; documents stored by an interrupted run count as unchanged
+        model_version = vs.model_version
+        plan = manifest.plan(pdf_files, model_version)
+        logger.info(f"New: {len(plan['new'])}, changed: {len(plan['changed'])}, "
+                    f"unchanged: {len(plan['unchanged'])}, removed: {len(plan['removed'])}")
+        
+        # Delete the vectors of PDFs no longer in the bucket
+        for entry in plan['removed']:
+            try:
+                vs.delete_vectors(entry['vector_ids'])
+                manifest.remove(entry['key'])
+                logger.info(f"Deleted {len(entry['vector_ids'])} vectors of removed PDF: {entry['key']}")
+            except Exception as e:
+                logger.error(f"Error deleting vectors of {entry['key']}: {e}")
         
-        # Process each PDF
-        for idx, pdf_key in tqdm(enumerate(pdf_files), total=len(pdf_files), desc="Processing documents"):
-            s3_uri = f"s3://{bucket_name}/{pdf_key}"
-            title = pdf_key.split('/')[-1].replace('.pdf', '')  # Use filename as title
-            
-            success = vs.store_document(
-                s3_uri=s3_uri,
+        objects = {}
+        documents = []
+        for obj, previous_vector_ids in plan['new'] + plan['changed']:
+            objects[obj['key']] = obj
+            title = obj['key'].split('/')[-1].replace('.pdf', '')  # Use filename as title
+            if not previous_vector_ids:
+                # Never stored under its document id: vectors from before the manifest were keyed by title,
+                # and are replaced once the document is stored
+                previous_vector_ids = vs.legacy_vector_ids(title)
+            documents.append(PipelineDocument(
+                key=obj['key'],
+                s3_uri=f"s3://{bucket_name}/{obj['key']}",
                 title=title,
                 metadata={
-                    "document_id": str(idx),
+                    "document_id": document_id_for(obj['key']),
                     "type": "research_document",
-                    "s3_key": pdf_key
-                }
-            )
-            
-            if success:
-                success_count += 1
+                    "s3_key": obj['key']
+                },
+                previous_vector_ids=previous_vector_ids
+            ))
+        
+        def record(document):
+            # Written as each document finishes, so a rerun after an interruption skips it
+            if document.error:
+                manifest.record_failed(objects[document.key], document.error)
             else:
-                failed_count += 1
-                
-            # Print status every 10 documents
-            if (idx + 1) % 10 == 0:
-                logger.info(f"Progress: {idx + 1}/{len(pdf_files)} documents")
-                logger.info(f"Successful: {success_count}, Failed: {failed_count}")
+                manifest.record_stored(objects[document.key], model_version, document.title, document.vector_ids)
+        
+        # Download, parse, embed and upsert concurrently, each stage feeding the next through a bounded queue
+        with tqdm(total=len(documents), desc="Processing documents") as progress_bar:
+            pipeline = IngestionPipeline(
+                vs,
+                fetch_workers=int(os.getenv('INGEST_FETCH_WORKERS', '8')),
+                parse_workers=int(os.getenv('INGEST_PARSE_WORKERS', '0')) or None,
+                queue_size=int(os.getenv('INGEST_QUEUE_SIZE', '16')),
+                batch_chunks=int(os.getenv('INGEST_BATCH_CHUNKS', '64')),
+                report_interval=float(os.getenv('INGEST_REPORT_INTERVAL', '10')),
+                progress=lambda document: (record(document), progress_bar.update(1))
+            )
+            summary = pipeline.run(documents)
         
         # Final summary
         logger.info("\nProcessing Complete!")
-        logger.info(f"Total documents processed: {len(pdf_files)}")
-        logger.info(f"Successfully stored: {success_count}")
-        logger.info(f"Failed to store: {failed_count}")
+        logger.info(f"Total documents processed: {summary['documents']} ({len(plan['unchanged'])} unchanged skipped)")
+        logger.info(f"Successfully stored: {summary['succeeded']}")
+        logger.info(f"Failed to store: {summary['failed']}")
+        logger.info(f"Elapsed: {summary['seconds']:.1f}s ({summary['documents_per_second']:.2f} documents/s), "
+                    f"bottleneck: {summary['bottleneck']}")
+        for name, stage in summary['stages'].items():
+            logger.info(f"  {name:>6}: {stage['processed']} done, {stage['failed']} failed, "
+                        f"{stage['per_second']:.2f}/s, {stage['utilization']:.0%} busy across {stage['workers']} workers")
+        for name, depth in summary['queues'].items():
+            logger.info(f"  queue {name}: max {depth['max']}/{depth['capacity']}, mean {depth['mean']}")
         
         # Test search
         query = "economic growth"
@@ -94,6 +135,8 @@ def main():
 
     except Exception as e:
         logger.error(f"Error in main: {e}")
+    finally:
+        manifest.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,263 @@
+# src/encoder.py
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'sentence-transformers/all-mpnet-base-v2'
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def mean_pool(hidden_state, attention_mask):
+    """Average token embeddings over real tokens only, so padding does not dilute the result"""
+    mask = attention_mask[:, :, None].astype(hidden_state.dtype)
+    return (hidden_state * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+
+def cosine_parity(reference, candidate):
+    """Row-wise cosine similarity between two embedding matrices, as (min, mean)"""
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = (reference * candidate).sum(axis=1)
+    return float(cosines.min()), float(cosines.mean())
+
+
+class TextEncoder:
+    """Batched CPU sentence encoder, running the model with PyTorch.
+
+    Texts are tokenized once, sorted by token count and run through the model
+    in batches of similar length, so little work goes into padding. A batch is
+    also capped at max_batch_tokens padded tokens: on CPU, batches of long texts
+    stop paying off once activations outgrow the caches. Embeddings are
+    returned in input order.
+
+    Subclasses swap the runtime by overriding _load_tokenizer, _tokenize_plain,
+    _load and _hidden_states.
+    """
+
+    backend = "torch"
+
+    def __init__(self, model_name=DEFAULT_MODEL, max_length=512, batch_size=32, max_batch_tokens=2048,
+                 num_threads=None):
+        self.model_name = model_name
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self._load(num_threads)
+        # Special tokens around a single sequence, e.g. <s> ... </s>, taken from encoding an empty text
+        specials = self._load_tokenizer()
+        self._prefix, self._suffix = specials[:1], specials[1:]
+        logger.info(f"Loaded encoder {model_name} with the {self.backend} backend")
+
+    def _load_tokenizer(self):
+        """Load the tokenizer and return the special token ids of an empty text"""
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.pad_token_id = self.tokenizer.pad_token_id
+        return self.tokenizer("")["input_ids"]
+
+    def _tokenize_plain(self, texts):
+        """Token ids and character offsets of each text, without special tokens or truncation"""
+        encoded = self.tokenizer(list(texts), add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        return list(zip(encoded["input_ids"], encoded["offset_mapping"]))
+
+    def _load(self, num_threads):
+        import torch
+        from transformers import AutoModel
+
+        if num_threads:
+            # Intra-op threads apply process-wide; set them before the first forward pass
+            torch.set_num_threads(num_threads)
+        self._torch = torch
+        self.model = AutoModel.from_pretrained(self.model_name)
+        self.model.eval()
+        self.dimension = self.model.config.hidden_size
+
+    def _hidden_states(self, input_ids, attention_mask):
+        with self._torch.inference_mode():
+            outputs = self.model(input_ids=self._torch.from_numpy(input_ids),
+                                 attention_mask=self._torch.from_numpy(attention_mask))
+        return outputs.last_hidden_state.numpy()
+
+    @property
+    def max_content_tokens(self):
+        return self.max_length - len(self._prefix) - len(self._suffix)
+
+    def tokenize(self, texts):
+        """Model input ids of each text, truncated to max_length with special tokens included"""
+        return [self._prefix + ids[:self.max_content_tokens] + self._suffix for ids, _ in self._tokenize_plain(texts)]
+
+    def _batches(self, lengths, batch_size):
+        """Positions grouped shortest first, each group within batch_size texts and max_batch_tokens"""
+        batch = []
+        for i in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+            # Sorted ascending, so the newest text sets the padded length of the batch
+            if batch and (len(batch) == batch_size or (len(batch) + 1) * lengths[i] > self.max_batch_tokens):
+                yield batch
+                batch = []
+            batch.append(i)
+        if batch:
+            yield batch
+
+    def embed_many(self, texts, batch_size=None):
+        """Embed texts as a float32 array of shape (len(texts), dimension)"""
+        return self.embed_ids(self.tokenize(texts), batch_size=batch_size)
+
+    def embed_ids(self, input_ids, batch_size=None):
+        """Embed already tokenized sequences, special tokens included"""
+        batch_size = batch_size or self.batch_size
+        embeddings = np.zeros((len(input_ids), self.dimension), dtype=np.float32)
+        if not input_ids:
+            return embeddings
+
+        lengths = [len(ids) for ids in input_ids]
+        for batch in self._batches(lengths, batch_size):
+            width = max(lengths[i] for i in batch)
+            input_batch = np.full((len(batch), width), self.pad_token_id, dtype=np.int64)
+            mask = np.zeros((len(batch), width), dtype=np.int64)
+            for row, i in enumerate(batch):
+                input_batch[row, :lengths[i]] = input_ids[i]
+                mask[row, :lengths[i]] = 1
+            embeddings[batch] = mean_pool(self._hidden_states(input_batch, mask), mask)
+        return embeddings
+
+    def chunk(self, text, chunk_tokens=256, overlap=32):
+        """Split text into overlapping windows of at most chunk_tokens tokens.
+
+        The text is tokenized once; each window's model input is cut from those
+        ids rather than re-tokenized, so the cost stays linear in the text length.
+        Returns (input_ids, chunk_text) pairs, input_ids with special tokens added.
+        """
+        chunk_tokens = min(chunk_tokens, self.max_content_tokens)
+        step = max(1, chunk_tokens - overlap)
+        ids, offsets = self._tokenize_plain([text])[0]
+
+        chunks = []
+        for start in range(0, max(len(ids) - overlap, 1), step):
+            window = ids[start:start + chunk_tokens]
+            if not window:
+                break
+            chunk_text = text[offsets[start][0]:offsets[start + len(window) - 1][1]]
+            chunks.append((self._prefix + window + self._suffix, chunk_text))
+        return chunks
+
+    def embed(self, text):
+        return self.embed_many([text])[0]
+
+
+def export_onnx(model_name, path, opset=17):
+    """Export the encoder's last hidden state to ONNX with dynamic batch and sequence axes.
+
+    The tokenizer is saved next to it as tokenizer.json, with its padding id in
+    encoder.json, so the ONNX backend can run without importing transformers.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    class _HiddenStates(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+    sample = torch.ones((2, 8), dtype=torch.long)
+    axes = {0: "batch", 1: "sequence"}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    torch.onnx.export(
+        _HiddenStates(model), (sample, torch.ones_like(sample)), path + ".tmp",
+        input_names=["input_ids", "attention_mask"], output_names=["last_hidden_state"],
+        dynamic_axes={"input_ids": axes, "attention_mask": axes, "last_hidden_state": axes},
+        opset_version=opset, dynamo=False
+    )
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    directory = os.path.dirname(path)
+    tokenizer.backend_tokenizer.save(os.path.join(directory, "tokenizer.json"))
+    with open(os.path.join(directory, "encoder.json"), "w") as f:
+        json.dump({"model_name": model_name, "pad_token_id": tokenizer.pad_token_id}, f)
+    os.replace(path + ".tmp", path)
+    logger.info(f"Exported {model_name} to {path}")
+
+
+def quantize_onnx(source, path):
+    """Quantize an ONNX model's weights to int8; activations are quantized dynamically at run time"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(source, path + ".tmp", weight_type=QuantType.QInt8)
+    os.replace(path + ".tmp", path)
+    logger.info(f"Quantized {source} to {path}")
+
+
+class OnnxTextEncoder(TextEncoder):
+    """The same encoder run by ONNX Runtime, optionally with int8 weights.
+
+    The model is exported to ONNX under cache_dir on first use, and quantized
+    once more if asked. Later runs load only the ONNX file and the standalone
+    tokenizer, so torch and transformers are needed for the export alone.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, quantize=False, cache_dir="onnx_models", **kwargs):
+        self.quantize = quantize
+        self.cache_dir = cache_dir
+        super().__init__(model_name, **kwargs)
+
+    @property
+    def backend(self):
+        return "onnx-int8" if self.quantize else "onnx"
+
+    def model_path(self):
+        directory = os.path.join(self.cache_dir, self.model_name.strip("/").replace("/", "--"))
+        return os.path.join(directory, "model.int8.onnx" if self.quantize else "model.onnx")
+
+    def _load(self, num_threads):
+        import onnxruntime
+
+        path = self.model_path()
+        if not os.path.exists(path):
+            exported = os.path.join(os.path.dirname(path), "model.onnx")
+            if not os.path.exists(exported):
+                export_onnx(self.model_name, exported)
+            if self.quantize:
+                quantize_onnx(exported, path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+
+    def _load_tokenizer(self):
+        from tokenizers import Tokenizer
+
+        directory = os.path.dirname(self.model_path())
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        # Truncation and padding are done by the encoder, over the whole text
+        self.tokenizer.no_truncation()
+        self.tokenizer.no_padding()
+        with open(os.path.join(directory, "encoder.json")) as f:
+            self.pad_token_id = json.load(f)["pad_token_id"]
+        return self.tokenizer.encode("").ids
+
+    def _tokenize_plain(self, texts):
+        return [(encoding.ids, encoding.offsets)
+                for encoding in self.tokenizer.encode_batch(list(texts), add_special_tokens=False)]
+
+    def _hidden_states(self, input_ids, attention_mask):
+        return self.session.run(None, {"input_ids": input_ids, "attention_mask": attention_mask})[0]
+
+
+def create_encoder(backend="torch", model_name=DEFAULT_MODEL, cache_dir="onnx_models", **kwargs):
+    """Build the encoder for one of BACKENDS"""
+    if backend == "torch":
+        return TextEncoder(model_name, **kwargs)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxTextEncoder(model_name, quantize=backend == "onnx-int8", cache_dir=cache_dir, **kwargs)
+    raise ValueError(f"Unknown encoder backend: {backend}. Choose one of {', '.join(BACKENDS)}")
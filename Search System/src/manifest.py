@@ -0,0 +1,114 @@
+# src/manifest.py
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STORED = "stored"
+FAILED = "failed"
+
+_COLUMNS = ("key", "etag", "size", "model_version", "title", "document_id", "vector_ids", "status", "error",
+            "updated_at")
+
+
+def document_id_for(key):
+    # Derived from the S3 key, so it stays the same however the bucket listing changes
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+class IngestionManifest:
+    """Record of what was ingested from each S3 object of a bucket, kept in SQLite.
+
+    An object is up to date when a stored entry has its ETag, size and the
+    current model version. Entries are written as each document finishes, so an
+    interrupted run resumes with the documents it had not stored yet.
+    """
+
+    def __init__(self, path, bucket):
+        self.path = path
+        self.bucket = bucket
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            "bucket TEXT NOT NULL, key TEXT NOT NULL, etag TEXT, size INTEGER, model_version TEXT, title TEXT, "
+            "document_id TEXT, vector_ids TEXT NOT NULL DEFAULT '[]', status TEXT NOT NULL, error TEXT, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (bucket, key))"
+        )
+        self._db.commit()
+
+    def entries(self):
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM objects WHERE bucket = ?", (self.bucket,)
+            ).fetchall()
+        entries = {}
+        for row in rows:
+            entry = dict(zip(_COLUMNS, row))
+            entry["vector_ids"] = json.loads(entry["vector_ids"])
+            entries[entry["key"]] = entry
+        return entries
+
+    def plan(self, objects, model_version):
+        """Split a bucket listing into new, changed, unchanged and removed objects.
+
+        objects are dicts with "key", "etag" and "size". New and changed items are
+        (object, previous vector ids) pairs; removed items are manifest entries.
+        """
+        entries = self.entries()
+        plan = {"new": [], "changed": [], "unchanged": [], "removed": []}
+        for obj in objects:
+            entry = entries.pop(obj["key"], None)
+            if entry is None:
+                plan["new"].append((obj, []))
+            elif (entry["status"] == STORED and entry["etag"] == obj["etag"] and entry["size"] == obj["size"]
+                  and entry["model_version"] == model_version):
+                plan["unchanged"].append(obj)
+            else:
+                plan["changed"].append((obj, entry["vector_ids"]))
+        plan["removed"] = list(entries.values())
+        return plan
+
+    def record_stored(self, obj, model_version, title, vector_ids):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO objects (bucket, key, etag, size, model_version, title, document_id, vector_ids, "
+                "status, error, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NULL, ?) "
+                "ON CONFLICT (bucket, key) DO UPDATE SET etag = excluded.etag, size = excluded.size, "
+                "model_version = excluded.model_version, title = excluded.title, "
+                "document_id = excluded.document_id, vector_ids = excluded.vector_ids, status = excluded.status, "
+                "error = NULL, updated_at = excluded.updated_at",
+                (self.bucket, obj["key"], obj["etag"], obj["size"], model_version, title, document_id_for(obj["key"]),
+                 json.dumps(list(vector_ids)), STORED, time.time())
+            )
+            self._db.commit()
+
+    def record_failed(self, obj, error):
+        # The last stored version's ETag and vector ids are kept, so its vectors can still be replaced or deleted
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO objects (bucket, key, document_id, status, error, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (bucket, key) DO UPDATE SET status = excluded.status, error = excluded.error, "
+                "updated_at = excluded.updated_at",
+                (self.bucket, obj["key"], document_id_for(obj["key"]), FAILED, error, time.time())
+            )
+            self._db.commit()
+
+    def remove(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM objects WHERE bucket = ? AND key = ?", (self.bucket, key))
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM objects WHERE bucket = ? GROUP BY status", (self.bucket,)
+            ).fetchall())
+
+    def close(self):
+        with self._lock:
+            self._db.close()
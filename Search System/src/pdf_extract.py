@@ -0,0 +1,21 @@
+# src/pdf_extract.py
+import io
+import logging
+
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# The search system parallelizes extraction across documents, one whole PDF per
+# process in src/pipeline.py, so it only needs single-document extraction here.
+# Page-parallel extraction of one large PDF lives in Application/src/pdf_extract.py.
+
+
+def extract_text(pdf_content):
+    """Text of a whole PDF, extracted in the calling process.
+
+    For callers that parallelize across documents rather than across the pages
+    of one; picklable, so it can run on a process pool.
+    """
+    reader = PdfReader(io.BytesIO(pdf_content))
+    return "".join(page.extract_text() or "" for page in reader.pages)
@@ -0,0 +1,369 @@
+# src/pipeline.py
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from src.pdf_extract import extract_text
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # end of stream, passed down the queues
+_IDLE = object()  # nothing arrived before the timeout
+
+def _timed_extract(pdf_content):
+    # Runs on the parse pool; the time is measured there so it excludes queueing
+    started = time.perf_counter()
+    text = extract_text(pdf_content)
+    return text, time.perf_counter() - started
+
+
+class PipelineDocument:
+    """One PDF on its way through the pipeline"""
+
+    def __init__(self, key, s3_uri, title, metadata=None, previous_vector_ids=None):
+        self.key = key
+        self.s3_uri = s3_uri
+        self.title = title
+        self.metadata = metadata or {}
+        # Vector ids of the version stored before, if known; those not overwritten are deleted
+        self.previous_vector_ids = previous_vector_ids
+        self.content = None
+        self.text = None
+        self.chunks = None
+        self.vectors = None
+        self.vector_ids = None  # ids of the stored vectors, once the document is done
+        self.error = None
+
+
+class StageStats:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok=True, items=1):
+        with self._lock:
+            self.busy_seconds += seconds
+            if ok:
+                self.processed += items
+            else:
+                self.failed += items
+
+    def to_dict(self, elapsed):
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "workers": self.workers,
+            "per_second": round(self.processed / elapsed, 3) if elapsed else 0.0,
+            "busy_seconds": round(self.busy_seconds, 3),
+            # Share of the stage's worker time spent working; the busiest stage bounds the pipeline
+            "utilization": round(self.busy_seconds / (elapsed * self.workers), 3) if elapsed else 0.0,
+        }
+
+
+class IngestionPipeline:
+    """Bulk PDF ingestion as four concurrent stages joined by bounded queues.
+
+    S3 downloads run on a thread pool, text extraction on a process pool, and
+    chunking plus embedding on one model worker that batches chunks across
+    documents. A final stage upserts vectors in batches. When a stage falls
+    behind, the queue in front of it fills and the stages upstream block, so
+    memory stays bounded and the run goes at the pace of the slowest stage.
+    """
+
+    def __init__(self, store, fetch_workers=8, parse_workers=None, queue_size=16, batch_chunks=64,
+                 report_interval=10.0, progress=None, mp_context="spawn"):
+        self.store = store
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.queue_size = queue_size
+        self.batch_chunks = batch_chunks
+        self.report_interval = report_interval
+        self.progress = progress
+        self.mp_context = mp_context
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def _put(self, target, item):
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source, timeout=None):
+        """Next item, _IDLE once timeout passes without one, or None when the pipeline is stopping"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._stop.is_set():
+            wait_for = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+            if wait_for <= 0:
+                return _IDLE
+            try:
+                return source.get(timeout=wait_for)
+            except queue.Empty:
+                continue
+        return None
+
+    def _finish(self, document, error=None):
+        document.error = error
+        if error is None:
+            document.vector_ids = [vector_id for vector_id, _, _ in document.vectors]
+        # Finished documents keep only their outcome, so a long run does not hold every vector in memory
+        document.content = document.text = document.chunks = document.vectors = None
+        with self._lock:
+            (self.failed if error else self.succeeded).append(document)
+        if error:
+            logger.error(f"Failed to ingest {document.key}: {error}")
+        if self.progress:
+            self.progress(document)
+
+    def _run_stage(self, name, target, *args):
+        try:
+            target(*args)
+        except Exception as e:
+            logger.exception(f"Pipeline stage {name} crashed: {e}")
+            self._errors.append(f"{name}: {e}")
+            self._stop.set()
+
+    def _fetch_stage(self, pending):
+        while not self._stop.is_set():
+            try:
+                document = pending.get_nowait()
+            except queue.Empty:
+                return
+            started = time.perf_counter()
+            document.content = self.store.fetch_pdf(document.s3_uri)
+            ok = document.content is not None
+            self.stats["fetch"].record(time.perf_counter() - started, ok)
+            if not ok:
+                self._finish(document, "download failed")
+            elif not self._put(self.queues["fetched"], document):
+                return
+
+    def _parse_stage(self, pool):
+        in_flight = {}  # future -> document
+        finished = False
+        while not self._stop.is_set():
+            # Keep each worker busy with one document and one queued behind it
+            if not finished and len(in_flight) < self.parse_workers * 2:
+                item = self._get(self.queues["fetched"], timeout=0.05 if in_flight else None)
+                if item is None:
+                    return
+                if item is _DONE:
+                    finished = True
+                elif item is not _IDLE:
+                    in_flight[pool.submit(_timed_extract, item.content)] = item
+                    item.content = None
+                    continue
+            if not in_flight:
+                if finished:
+                    break
+                continue
+
+            done, _ = wait(in_flight, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                document = in_flight.pop(future)
+                try:
+                    text, seconds = future.result()
+                except Exception as e:
+                    self.stats["parse"].record(0.0, ok=False)
+                    self._finish(document, f"text extraction failed: {e}")
+                    continue
+                self.stats["parse"].record(seconds, ok=bool(text))
+                if not text:
+                    self._finish(document, "no text could be extracted")
+                    continue
+                document.text = text
+                if not self._put(self.queues["parsed"], document):
+                    return
+        self._put(self.queues["parsed"], _DONE)
+
+    def _embed_stage(self):
+        finished = False
+        while not finished and not self._stop.is_set():
+            # Wait for one document, then take whatever else is ready, up to batch_chunks chunks
+            batch, chunk_count = [], 0
+            item = self._get(self.queues["parsed"])
+            while item is not None:
+                if item is _DONE:
+                    finished = True
+                    break
+                started = time.perf_counter()
+                try:
+                    item.chunks = self.store.chunk_document(item.text)
+                    error = None if item.chunks else "no text to embed"
+                except Exception as e:
+                    error = f"chunking failed: {e}"
+                self.stats["embed"].record(time.perf_counter() - started, items=0)
+                if error is None:
+                    batch.append(item)
+                    chunk_count += len(item.chunks)
+                else:
+                    self.stats["embed"].record(0.0, ok=False)
+                    self._finish(item, error)
+                if chunk_count >= self.batch_chunks:
+                    break
+                try:
+                    item = self.queues["parsed"].get_nowait()
+                except queue.Empty:
+                    break
+            if item is None:
+                return
+            if batch and not self._embed_batch(batch):
+                return
+        self._put(self.queues["embedded"], _DONE)
+
+    def _embed_batch(self, batch):
+        started = time.perf_counter()
+        try:
+            embeddings = self.store.encoder.embed_ids(
+                [input_ids for document in batch for input_ids, _ in document.chunks]
+            )
+        except Exception as e:
+            self.stats["embed"].record(time.perf_counter() - started, ok=False, items=len(batch))
+            for document in batch:
+                self._finish(document, f"embedding failed: {e}")
+            return True
+
+        offset = 0
+        for document in batch:
+            document_embeddings = embeddings[offset:offset + len(document.chunks)]
+            offset += len(document.chunks)
+            document.vectors = self.store.assemble_vectors(
+                document.title, document.text, {**document.metadata, "source": document.s3_uri},
+                document.chunks, document_embeddings
+            )
+            document.text = document.chunks = None
+        self.stats["embed"].record(time.perf_counter() - started, items=len(batch))
+        return all(self._put(self.queues["embedded"], document) for document in batch)
+
+    def _upsert_stage(self):
+        pending, vector_count = [], 0
+        finished = False
+        while not finished:
+            # Flush once a full request is ready, or whenever the model worker pauses
+            item = self._get(self.queues["embedded"], timeout=0.5)
+            if item is None:
+                return
+            if item is _DONE:
+                finished = True
+            elif item is not _IDLE:
+                pending.append(item)
+                vector_count += len(item.vectors)
+            if pending and (finished or item is _IDLE or vector_count >= self.store.upsert_batch_size):
+                self._flush(pending)
+                pending, vector_count = [], 0
+
+    def _flush(self, documents):
+        started = time.perf_counter()
+        try:
+            self.store.upsert_vectors([vector for document in documents for vector in document.vectors])
+        except Exception as e:
+            self.stats["upsert"].record(time.perf_counter() - started, ok=False, items=len(documents))
+            for document in documents:
+                self._finish(document, f"upsert failed: {e}")
+            return
+        for document in documents:
+            self.store.delete_stale_chunks(self.store.document_id(document.title, document.metadata),
+                                           {vector_id for vector_id, _, _ in document.vectors},
+                                           previous=document.previous_vector_ids)
+        self.stats["upsert"].record(time.perf_counter() - started, items=len(documents))
+        for document in documents:
+            self._finish(document)
+
+    def _sample_queues(self):
+        for name, stage_queue in self.queues.items():
+            depth = stage_queue.qsize()
+            sample = self.depths[name]
+            sample["max"] = max(sample["max"], depth)
+            sample["total"] += depth
+            sample["samples"] += 1
+
+    def _report_loop(self, started):
+        next_report = time.monotonic() + self.report_interval
+        while not self._done.wait(0.25):
+            self._sample_queues()
+            if self.report_interval and time.monotonic() >= next_report:
+                next_report += self.report_interval
+                logger.info(self.format_progress(time.perf_counter() - started))
+
+    def format_progress(self, elapsed):
+        stages = " | ".join(
+            f"{name} {stats.processed} ({stats.processed / elapsed:.2f}/s)" for name, stats in self.stats.items()
+        )
+        depths = " ".join(f"{name} {stage_queue.qsize()}/{self.queue_size}" for name, stage_queue in self.queues.items())
+        return f"{stages} | queues {depths}"
+
+    def run(self, documents):
+        """Ingest the documents; returns a summary with per-stage throughput and queue depths"""
+        self.succeeded, self.failed = [], []
+        self._errors = []
+        self._stop.clear()
+        self._done = threading.Event()
+        self.queues = {name: queue.Queue(maxsize=self.queue_size) for name in ("fetched", "parsed", "embedded")}
+        self.depths = {name: {"max": 0, "total": 0, "samples": 0} for name in self.queues}
+        self.stats = {
+            "fetch": StageStats("fetch", self.fetch_workers),
+            "parse": StageStats("parse", self.parse_workers),
+            "embed": StageStats("embed", 1),
+            "upsert": StageStats("upsert", 1),
+        }
+        pending = queue.Queue()
+        for document in documents:
+            pending.put(document)
+
+        started = time.perf_counter()
+        pool = ProcessPoolExecutor(max_workers=self.parse_workers,
+                                   mp_context=multiprocessing.get_context(self.mp_context))
+        fetchers = [
+            threading.Thread(target=self._run_stage, args=("fetch", self._fetch_stage, pending),
+                             name=f"fetch-{i}", daemon=True)
+            for i in range(self.fetch_workers)
+        ]
+        workers = [
+            threading.Thread(target=self._run_stage, args=("parse", self._parse_stage, pool), name="parse", daemon=True),
+            threading.Thread(target=self._run_stage, args=("embed", self._embed_stage), name="embed", daemon=True),
+            threading.Thread(target=self._run_stage, args=("upsert", self._upsert_stage), name="upsert", daemon=True),
+        ]
+        reporter = threading.Thread(target=self._report_loop, args=(started,), name="report", daemon=True)
+        try:
+            for thread in fetchers + workers + [reporter]:
+                thread.start()
+            for thread in fetchers:
+                thread.join()
+            self._put(self.queues["fetched"], _DONE)
+            for thread in workers:
+                thread.join()
+        finally:
+            self._stop.set()
+            self._done.set()
+            reporter.join()
+            pool.shutdown(wait=True, cancel_futures=True)
+        if self._errors:
+            raise RuntimeError(f"Ingestion pipeline failed: {'; '.join(self._errors)}")
+
+        elapsed = time.perf_counter() - started
+        stages = {name: stats.to_dict(elapsed) for name, stats in self.stats.items()}
+        return {
+            "documents": len(documents),
+            "succeeded": len(self.succeeded),
+            "failed": len(self.failed),
+            "seconds": round(elapsed, 3),
+            "documents_per_second": round(len(self.succeeded) / elapsed, 3) if elapsed else 0.0,
+            "bottleneck": max(stages, key=lambda name: stages[name]["utilization"]),
+            "stages": stages,
+            "queues": {
+                name: {"max": depth["max"], "mean": round(depth["total"] / depth["samples"], 2) if depth["samples"] else 0.0,
+                       "capacity": self.queue_size}
+                for name, depth in self.depths.items()
+            },
+        }
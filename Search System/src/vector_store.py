@@ -1,15 +1,14 @@
 # src/vector_store.py
 import pinecone
 import boto3
-from transformers import AutoTokenizer, AutoModel
-import torch
-import PyPDF2
-import io
 import os
+import numpy as np
 from dotenv import load_dotenv
 import logging
 from tqdm import tqdm
 import time
+from src.pdf_extract import extract_text
+from src.encoder import create_encoder
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -30,161 +29,238 @@ class VectorStore:
             aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
         )
         
-        # Initialize the model
-        self.tokenizer = AutoTokenizer.from_pretrained('sentence-transformers/all-mpnet-base-v2')
-        self.model = AutoModel.from_pretrained('sentence-transformers/all-mpnet-base-v2')
+        # Initialize the model, batching texts of similar length together
+        self.encoder = create_encoder(
+            os.getenv('EMBED_BACKEND', 'torch'),
+            'sentence-transformers/all-mpnet-base-v2',
+            cache_dir=os.getenv('ONNX_CACHE_DIR', 'onnx_models'),
+            batch_size=int(os.getenv('EMBED_BATCH_SIZE', '32')),
+            max_batch_tokens=int(os.getenv('EMBED_MAX_BATCH_TOKENS', '2048')),
+            num_threads=int(os.getenv('EMBED_THREADS', '0')) or None
+        )
         
+        # Documents are indexed as overlapping chunks, each its own vector
+        self.chunk_tokens = int(os.getenv('EMBED_CHUNK_TOKENS', '256'))
+        self.chunk_overlap = int(os.getenv('EMBED_CHUNK_OVERLAP', '32'))
+        self.store_document_vector = os.getenv('STORE_DOCUMENT_VECTOR', 'true').lower() == 'true'
+        self.search_candidates_per_document = int(os.getenv('SEARCH_CANDIDATES_PER_DOCUMENT', '10'))
+        self.upsert_batch_size = 100
+
         # Connect to existing index
         self.index_name = "research-notes"
         self.index = self.pc.Index(self.index_name)
         logger.info(f"Connected to index: {self.index_name}")
 
-    def read_pdf(self, s3_uri, max_retries=3):
-        """Read PDF content from S3 with retries"""
+    def fetch_pdf(self, s3_uri, max_retries=3):
+        """Download PDF bytes from S3 with retries"""
         for attempt in range(max_retries):
             try:
                 parts = s3_uri.replace("s3://", "").split("/")
                 bucket = parts[0]
                 key = "/".join(parts[1:])
-                
+
                 response = self.s3.get_object(Bucket=bucket, Key=key)
-                pdf_content = io.BytesIO(response['Body'].read())
-                
-                pdf_reader = PyPDF2.PdfReader(pdf_content)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-                return text
+                return response['Body'].read()
             except Exception as e:
                 if attempt == max_retries - 1:
-                    logger.error(f"Failed to read PDF after {max_retries} attempts: {e}")
+                    logger.error(f"Failed to fetch PDF after {max_retries} attempts: {e}")
                     return None
                 time.sleep(1)  # Wait before retrying
 
+    def read_pdf(self, s3_uri, max_retries=3):
+        """Read PDF content from S3 with retries"""
+        pdf_content = self.fetch_pdf(s3_uri, max_retries)
+        if pdf_content is None:
+            return None
+        try:
+            # Page texts are joined once; main.py runs many documents in parallel through the pipeline
+            return extract_text(pdf_content)
+        except Exception as e:
+            logger.error(f"Failed to extract PDF text from {s3_uri}: {e}")
+            return None
+
+
+    def embed_many(self, texts, batch_size=None):
+        """Generate embeddings for many texts in batches, returned in input order"""
+        try:
+            return self.encoder.embed_many(texts, batch_size=batch_size)
+        except Exception as e:
+            logger.error(f"Error generating embeddings: {e}")
+            return None
 
     def generate_embedding(self, text):
         """Generate embedding for text"""
+        embeddings = self.embed_many([text])
+        return None if embeddings is None else embeddings[0]
+
+    @property
+    def model_version(self):
+        """Everything that determines a document's vectors; a change means documents must be re-embedded"""
+        pooled = "pooled" if self.store_document_vector else "chunks"
+        return f"{self.encoder.model_name}:{self.encoder.backend}:{self.chunk_tokens}/{self.chunk_overlap}:{pooled}"
+
+    @staticmethod
+    def document_id(title, metadata=None):
+        """Id prefix of a document's vectors: its document_id metadata, or the title for documents stored without one"""
+        return (metadata or {}).get("document_id") or title
+
+    def chunk_id(self, document_id, index):
+        # Chunk ids share the document's prefix, so a document's chunks can be listed and deleted together
+        return f"{document_id}#chunk-{index}"
+
+    def chunk_document(self, text):
+        """(input_ids, chunk_text) pairs of a document, ready for encoder.embed_ids"""
+        return self.encoder.chunk(text, chunk_tokens=self.chunk_tokens, overlap=self.chunk_overlap)
+
+    def document_vectors(self, title, text, metadata=None):
+        """Chunk and embed a document; returns the (id, values, metadata) records to upsert"""
+        chunks = self.chunk_document(text)
+        if not chunks:
+            return []
+        embeddings = self.encoder.embed_ids([input_ids for input_ids, _ in chunks])
+        return self.assemble_vectors(title, text, metadata, chunks, embeddings)
+
+    def assemble_vectors(self, title, text, metadata, chunks, embeddings):
+        """Upsert records for a document's chunks and their embeddings, plus its pooled vector"""
+        document_id = self.document_id(title, metadata)
+        metadata = dict(metadata or {})
+        metadata.update({"title": title, "chunk_count": len(chunks)})
+        vectors = [
+            (self.chunk_id(document_id, i), embedding.tolist(),
+             {**metadata, "kind": "chunk", "chunk_index": i, "text": chunk_text})
+            for i, (embedding, (_, chunk_text)) in enumerate(zip(embeddings, chunks))
+        ]
+        if self.store_document_vector:
+            # Token-weighted mean of the chunk vectors, under the document id itself
+            weights = np.array([len(input_ids) for input_ids, _ in chunks], dtype=np.float32)
+            pooled = (embeddings * weights[:, None]).sum(axis=0) / weights.sum()
+            vectors.append((document_id, pooled.tolist(), {**metadata, "kind": "document", "text_preview": text[:500]}))
+        return vectors
+
+    def upsert_vectors(self, vectors):
+        for start in range(0, len(vectors), self.upsert_batch_size):
+            self.index.upsert(vectors=vectors[start:start + self.upsert_batch_size])
+
+    def list_chunk_ids(self, document_id):
+        """Ids of a document's chunk vectors; needs an index that supports listing by prefix"""
+        ids = []
+        for page in self.index.list(prefix=f"{document_id}#chunk-"):
+            ids.extend(page)
+        return ids
+
+    def legacy_vector_ids(self, title):
+        """Ids a document had before vectors were keyed by document_id: the title and its title-prefixed chunks"""
+        ids = [title]
         try:
-            inputs = self.tokenizer(
-                text,
-                return_tensors="pt",
-                truncation=True,
-                max_length=512,
-                padding=True
-            )
-            
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-            
-            # Get embedding from the last hidden state
-            embedding = outputs.last_hidden_state.mean(dim=1).numpy()[0]
-            return embedding
+            ids.extend(self.list_chunk_ids(title))
         except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
-            return None
+            logger.warning(f"Could not list legacy chunks of {title}: {e}")
+        return ids
+
+    def delete_vectors(self, ids):
+        for start in range(0, len(ids), 1000):
+            self.index.delete(ids=ids[start:start + 1000])
+
+    def delete_stale_chunks(self, document_id, keep, previous=None):
+        """Delete vectors of an older version of a document that the new version did not overwrite.
+
+        previous lists the old version's vector ids when they are known; otherwise
+        the document's chunks are listed from the index.
+        """
+        # A shorter new version of a document leaves chunks of the old one behind
+        try:
+            existing = previous if previous is not None else self.list_chunk_ids(document_id)
+            self.delete_vectors([vector_id for vector_id in existing if vector_id not in keep])
+        except Exception as e:
+            logger.warning(f"Could not remove stale chunks of {document_id}: {e}")
 
-    def store_document(self, s3_uri, title, metadata=None):
-        """Store document in Pinecone"""
+    def store_document(self, s3_uri, title, metadata=None, timeout=300):
+        """Store document in Pinecone as one vector per chunk, plus a pooled document vector"""
         try:
-            # Read document
+            start_time = time.time()
+
+            # Read document with timeout check
             text = self.read_pdf(s3_uri)
             if not text:
                 return False
-            
-            # Generate embedding
-            embedding = self.generate_embedding(text)
-            if embedding is None:
+
+            if time.time() - start_time > timeout:
+                logger.error(f"Timeout processing document: {title}")
                 return False
-            
-            # Prepare metadata
-            metadata = metadata or {}
-            metadata.update({
-                "title": title,
-                "source": s3_uri,
-                "text_preview": text[:1000]  # Store first 1000 chars as preview
-            })
-            
+
+            # Generate chunk embeddings
+            metadata = dict(metadata or {})
+            metadata["source"] = s3_uri
+            vectors = self.document_vectors(title, text, metadata)
+            if not vectors:
+                return False
+
             # Store in Pinecone
-            self.index.upsert(
-                vectors=[(
-                    title,  # Using title as ID
-                    embedding.tolist(),
-                    metadata
-                )]
-            )
-            logger.info(f"Successfully stored document: {title}")
+            self.upsert_vectors(vectors)
+            self.delete_stale_chunks(self.document_id(title, metadata), {vector_id for vector_id, _, _ in vectors})
+            logger.info(f"Successfully stored document: {title} ({len(vectors)} vectors)")
             return True
+
         except Exception as e:
-            logger.error(f"Error storing document: {e}")
+            logger.error(f"Error storing document {title}: {e}")
             return False
 
     def search(self, query, top_k=5):
-        """Search for similar documents"""
+        """Search for similar documents.
+
+        Chunk hits are grouped by document, which scores as its best chunk or its
+        pooled vector, whichever is higher. Matches carry the document metadata,
+        with the best chunk's text and the number of matching chunks.
+        """
         try:
             # Generate query embedding
             query_embedding = self.generate_embedding(query)
             if query_embedding is None:
                 return None
-            
-            # Search in Pinecone
+
+            # Search in Pinecone, over-fetching so enough distinct documents remain after grouping
             results = self.index.query(
                 vector=query_embedding.tolist(),
-                top_k=top_k,
+                top_k=top_k * self.search_candidates_per_document,
                 include_metadata=True
             )
-            
-            return results
+
+            documents = {}
+            for match in results['matches']:
+                metadata = match['metadata'] or {}
+                # Grouped by document id, so PDFs sharing a filename under different prefixes stay apart
+                document_id = metadata.get('document_id') or metadata.get('title', match['id'])
+                document = documents.get(document_id)
+                if document is None:
+                    document = documents[document_id] = {"id": document_id, "score": match['score'], "metadata": {}, "chunk_hits": 0}
+                document["score"] = max(document["score"], match['score'])
+                if metadata.get("kind") == "chunk":
+                    document["chunk_hits"] += 1
+                    if "best_chunk" not in document["metadata"]:
+                        document["metadata"]["best_chunk"] = metadata.get("text", "")
+                for key, value in metadata.items():
+                    if key not in ("kind", "chunk_index", "text"):
+                        document["metadata"].setdefault(key, value)
+
+            matches = sorted(documents.values(), key=lambda document: document["score"], reverse=True)[:top_k]
+            for document in matches:
+                document["metadata"]["chunk_hits"] = document.pop("chunk_hits")
+            return {"matches": matches}
         except Exception as e:
             logger.error(f"Error searching: {e}")
             return None
 
-    def delete_document(self, title):
-        """Delete a document from the index"""
+    def delete_document(self, document_id):
+        """Delete a document and its chunks from the index, by document id (the title if stored without one)"""
         try:
-            self.index.delete(ids=[title])
-            logger.info(f"Successfully deleted document: {title}")
+            ids = [document_id]
+            try:
+                ids.extend(self.list_chunk_ids(document_id))
+            except Exception as e:
+                logger.warning(f"Could not list chunks of {document_id}: {e}")
+            self.delete_vectors(ids)
+            logger.info(f"Successfully deleted document: {document_id}")
             return True
         except Exception as e:
             logger.error(f"Error deleting document: {e}")
             return False
-        
-    def store_document(self, s3_uri, title, metadata=None, timeout=300):
-        """Store document in Pinecone with timeout"""
-        try:
-            start_time = time.time()
-            
-            # Read document with timeout check
-            text = self.read_pdf(s3_uri)
-            if not text:
-                return False
-            
-            if time.time() - start_time > timeout:
-                logger.error(f"Timeout processing document: {title}")
-                return False
-            
-            # Generate embedding
-            embedding = self.generate_embedding(text)
-            if embedding is None:
-                return False
-            
-            # Prepare metadata
-            metadata = metadata or {}
-            metadata.update({
-                "title": title,
-                "source": s3_uri,
-                "text_preview": text[:500]  # Reduced preview length
-            })
-            
-            # Store in Pinecone
-            self.index.upsert(
-                vectors=[(
-                    title,
-                    embedding.tolist(),
-                    metadata
-                )]
-            )
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error storing document {title}: {e}")
-            return False
\ No newline at end of file
@@ -23,9 +23,20 @@ class DocumentRetriever:
         results = self.index.query(
             vector=[0]*768,  # Dimension size matches your model
             top_k=100,
-            include_metadata=True
+            include_metadata=True,
+            # Document records, plus each document's first chunk for documents stored without one
+            filter={"$or": [{"kind": {"$ne": "chunk"}}, {"chunk_index": 0}]}
         )
-        return [match['metadata'] for match in results['matches']]
+        pdfs = {}
+        for match in results['matches']:
+            metadata = match['metadata'] or {}
+            document_id = metadata.get('document_id') or metadata.get('title', match['id'])
+            if metadata.get('kind') == "chunk":
+                if document_id in pdfs:
+                    continue
+                metadata = {**metadata, "text_preview": metadata.get('text', '')[:500]}
+            pdfs[document_id] = metadata
+        return list(pdfs.values())
     
     def get_summary(self, text: str) -> str:
         """Generate summary using OpenAI"""